@@ -0,0 +1,302 @@
+"""Incrementally maintained expense aggregates.
+
+Every expense write adjusts running sums and counts per user, category and
+period bucket inside the same transaction, so the summary and period-total
+endpoints read a handful of pre-aggregated rows instead of every expense.
+"""
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import bindparam, func
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from models import db, Expense, ExpenseAggregate
+
+# Bucket key formats, matching the period keys returned by /api/expenses
+PERIOD_FORMATS = {
+    'daily': '%Y-%m-%d',
+    'weekly': '%Y-W%U',
+    'monthly': '%Y-%m',
+}
+
+# Lifetime totals per category live in a single bucket
+TOTAL_PERIOD = 'total'
+TOTAL_BUCKET = 'all'
+
+# Keeps IN (...) lists under SQLite's bound parameter limit
+LOOKUP_BATCH_SIZE = 500
+
+
+def bucket_deltas(rows, sign=1):
+    """Fold (date, category, amount_cents) rows into per-bucket (cents, count) deltas"""
+    deltas = defaultdict(lambda: [0, 0])
+    for expense_date, category, cents in rows:
+        keys = [(period, expense_date.strftime(fmt), category) for period, fmt in PERIOD_FORMATS.items()]
+        keys.append((TOTAL_PERIOD, TOTAL_BUCKET, category))
+        for key in keys:
+            deltas[key][0] += sign * int(cents)
+            deltas[key][1] += sign
+    return deltas
+
+
+def _upsert_buckets(table):
+    """INSERT of buckets that adds to a bucket when it already exists, or None
+    when the dialect has no upsert"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        statement = mysql.insert(table)
+        return statement.on_duplicate_key_update(
+            total_cents=table.c.total_cents + statement.inserted.total_cents,
+            count=table.c.count + statement.inserted.count
+        )
+    if dialect in ('postgresql', 'sqlite'):
+        statement = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=['user_id', 'period', 'category', 'bucket'],
+            set_={'total_cents': table.c.total_cents + statement.excluded.total_cents,
+                  'count': table.c.count + statement.excluded.count}
+        )
+    return None
+
+
+def apply_deltas(user_id, deltas):
+    """Add the given deltas to the user's aggregate rows in the current session.
+
+    Added expenses are upserted into their buckets with one executemany, so
+    neither a bucket another writer creates nor one it empties and deletes
+    meanwhile can make the addition fail or go missing. Removals (and
+    additions on dialects without an upsert) look up the existing buckets
+    in one query, then increment and create them with one executemany
+    each. A bulk import costs a few statements rather than one per bucket.
+    The caller owns the transaction: nothing is committed here, so the
+    aggregates change atomically with the expense rows they describe.
+    """
+    if not deltas:
+        return
+
+    table = ExpenseAggregate.__table__
+    upsert = _upsert_buckets(table)
+    if upsert is not None:
+        additions = [
+            {'user_id': user_id, 'period': period, 'bucket': bucket, 'category': category,
+             'total_cents': cents, 'count': count}
+            for (period, bucket, category), (cents, count) in deltas.items() if count > 0
+        ]
+        if additions:
+            db.session.execute(upsert, additions)
+        deltas = {key: delta for key, delta in deltas.items() if delta[1] <= 0}
+        if not deltas:
+            return
+
+    existing = {}
+    buckets = sorted({bucket for _, bucket, _ in deltas})
+    for start in range(0, len(buckets), LOOKUP_BATCH_SIZE):
+        rows = db.session.query(
+            ExpenseAggregate.id, ExpenseAggregate.period, ExpenseAggregate.bucket, ExpenseAggregate.category
+        ).filter(
+            ExpenseAggregate.user_id == user_id,
+            ExpenseAggregate.bucket.in_(buckets[start:start + LOOKUP_BATCH_SIZE])
+        )
+        for aggregate_id, period, bucket, category in rows:
+            existing[(period, bucket, category)] = aggregate_id
+
+    updates = []
+    inserts = []
+    for key, (cents, count) in deltas.items():
+        if key in existing:
+            updates.append({'aggregate_id': existing[key], 'delta_total': cents, 'delta_count': count})
+        elif count > 0:
+            period, bucket, category = key
+            inserts.append({'user_id': user_id, 'period': period, 'bucket': bucket,
+                            'category': category, 'total_cents': cents, 'count': count})
+
+    if updates:
+        # Increment in SQL so concurrent writers never lose an update
+        db.session.execute(
+            table.update()
+            .where(table.c.id == bindparam('aggregate_id'))
+            .values(total_cents=table.c.total_cents + bindparam('delta_total'),
+                    count=table.c.count + bindparam('delta_count')),
+            updates
+        )
+        # Drop emptied buckets so they disappear from period totals
+        touched = [update['aggregate_id'] for update in updates]
+        for start in range(0, len(touched), LOOKUP_BATCH_SIZE):
+            db.session.execute(table.delete().where(
+                table.c.id.in_(touched[start:start + LOOKUP_BATCH_SIZE]),
+                table.c.count <= 0
+            ))
+    if inserts:
+        db.session.execute(table.insert(), inserts)
+
+
+def record_expenses(user_id, rows):
+    """Account for newly added (date, category, amount_cents) rows of one user"""
+    apply_deltas(user_id, bucket_deltas(rows))
+
+
+def remove_expenses(user_id, rows):
+    """Account for deleted (date, category, amount_cents) rows of one user"""
+    apply_deltas(user_id, bucket_deltas(rows, sign=-1))
+
+
+def record_expense(expense):
+    """Account for a newly added expense"""
+    record_expenses(expense.user_id, [(expense.date, expense.category, expense.amount_cents)])
+
+
+def remove_expense(expense):
+    """Account for a deleted expense"""
+    remove_expenses(expense.user_id, [(expense.date, expense.category, expense.amount_cents)])
+
+
+def rebuild_aggregates(user_id=None):
+    """Recompute aggregates from the expense table, for one user or everyone.
+
+    Used to backfill the store for data written before it existed (see
+    migrations.py); the caller commits.
+    """
+    aggregate_query = ExpenseAggregate.query
+    expense_query = db.session.query(Expense.user_id, Expense.date, Expense.category, Expense.amount_cents)
+    if user_id is not None:
+        aggregate_query = aggregate_query.filter_by(user_id=user_id)
+        expense_query = expense_query.filter(Expense.user_id == user_id)
+    aggregate_query.delete(synchronize_session=False)
+
+    rows_by_user = defaultdict(list)
+    for owner_id, expense_date, category, cents in expense_query:
+        rows_by_user[owner_id].append((expense_date, category, cents))
+
+    for owner_id, rows in rows_by_user.items():
+        for (period, bucket, category), (cents, count) in bucket_deltas(rows).items():
+            db.session.add(ExpenseAggregate(
+                user_id=owner_id, period=period, category=category,
+                bucket=bucket, total_cents=cents, count=count
+            ))
+
+
+def _period_query(user_id, period, category='all'):
+    query = db.session.query(ExpenseAggregate.bucket, func.sum(ExpenseAggregate.total_cents)).filter(
+        ExpenseAggregate.user_id == user_id,
+        ExpenseAggregate.period == period
+    )
+    if category != 'all':
+        query = query.filter(ExpenseAggregate.category == category)
+    return query.group_by(ExpenseAggregate.bucket)
+
+
+def _daily_rows(user_id, start=None, end=None):
+    """(date, category, cents) of the user's daily buckets between start and end, inclusive.
+
+    Daily bucket keys are ISO dates, so the range is a plain string range
+    served by the (user_id, period, bucket) index.
+    """
+    query = db.session.query(
+        ExpenseAggregate.bucket, ExpenseAggregate.category, ExpenseAggregate.total_cents
+    ).filter(
+        ExpenseAggregate.user_id == user_id,
+        ExpenseAggregate.period == 'daily'
+    )
+    if start is not None:
+        query = query.filter(ExpenseAggregate.bucket >= start.isoformat())
+    if end is not None:
+        query = query.filter(ExpenseAggregate.bucket <= end.isoformat())
+    return [(date.fromisoformat(bucket), category, cents) for bucket, category, cents in query]
+
+
+def get_category_totals(user_id):
+    """Lifetime spend per category, in cents"""
+    rows = ExpenseAggregate.query.filter_by(
+        user_id=user_id, period=TOTAL_PERIOD, bucket=TOTAL_BUCKET
+    ).all()
+    return {row.category: row.total_cents for row in rows}
+
+
+def get_period_totals(user_id, period, category='all', start=None, end=None):
+    """Spend per period bucket in cents, keyed like the /api/expenses response.
+
+    With a date range, the range's daily buckets are regrouped into the
+    period, so partial weeks and months count only the days inside it.
+    """
+    if start is None and end is None:
+        return {bucket: total for bucket, total in _period_query(user_id, period, category)}
+
+    totals = defaultdict(int)
+    for expense_date, row_category, cents in _daily_rows(user_id, start, end):
+        if category == 'all' or row_category == category:
+            totals[expense_date.strftime(PERIOD_FORMATS[period])] += cents
+    return dict(totals)
+
+
+def _summary_stats_in_range(user_id, category, start, end):
+    """get_summary_stats over the daily buckets of a date range"""
+    rows = _daily_rows(user_id, start, end)
+
+    category_totals = defaultdict(int)
+    weekly_data = defaultdict(int)
+    days = set()
+    for expense_date, row_category, cents in rows:
+        category_totals[row_category] += cents
+        if category == 'all' or row_category == category:
+            weekly_data[expense_date.strftime('%U')] += cents
+            days.add(expense_date)
+
+    if not days:
+        return None
+
+    if category == 'all':
+        plot_totals = dict(category_totals)
+    else:
+        plot_totals = {category: category_totals[category]}
+    total = sum(plot_totals.values())
+
+    return {
+        "total": total,
+        "avg_daily": total / len(days),
+        "weekly_data": dict(weekly_data),
+        "category_totals": dict(category_totals),
+        "plot_totals": plot_totals
+    }
+
+
+def get_summary_stats(user_id, category='all', start=None, end=None):
+    """Summary statistics for /api/summary, read from the aggregate store.
+
+    Amounts are in cents. Returns None when the user has no expenses
+    matching the category (and date range, if given).
+    """
+    if start is not None or end is not None:
+        return _summary_stats_in_range(user_id, category, start, end)
+
+    category_totals = get_category_totals(user_id)
+    if category == 'all':
+        plot_totals = dict(category_totals)
+    else:
+        plot_totals = {k: v for k, v in category_totals.items() if k == category}
+
+    if not plot_totals:
+        return None
+
+    total = sum(plot_totals.values())
+
+    # Mean of per-day totals = total / number of distinct days with spending
+    days_query = db.session.query(func.count(func.distinct(ExpenseAggregate.bucket))).filter(
+        ExpenseAggregate.user_id == user_id,
+        ExpenseAggregate.period == 'daily'
+    )
+    if category != 'all':
+        days_query = days_query.filter(ExpenseAggregate.category == category)
+    days = days_query.scalar() or 1
+
+    # Weekly data is keyed by week number only ('%U'), merging years
+    weekly_data = defaultdict(int)
+    for bucket, cents in _period_query(user_id, 'weekly', category):
+        weekly_data[bucket.split('-W')[1]] += cents
+
+    return {
+        "total": total,
+        "avg_daily": total / days,
+        "weekly_data": dict(weekly_data),
+        "category_totals": category_totals,
+        "plot_totals": plot_totals
+    }
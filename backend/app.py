@@ -1,17 +1,12 @@
 from flask import Flask, jsonify, request
 import pandas as pd
 import numpy as np
-import os
-import json
 from datetime import datetime, timedelta
 import base64
-import matplotlib
-matplotlib.use('Agg')  # Must be before other matplotlib imports
-import matplotlib.pyplot as plt
-import seaborn as sns
-from io import BytesIO
 from flask_cors import CORS
 import warnings
+from chart_cache import ChartCache, chart_key
+from chart_renderer import ChartRenderService, chart_spec
 
 # Filter out UserWarnings
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -49,6 +44,10 @@ def generate_sample_data():
 # Sample data
 SAMPLE_DATA = generate_sample_data()
 
+# Rendered summary charts, keyed by a fingerprint of the plotted data
+chart_cache = ChartCache()
+chart_renderer = ChartRenderService()
+
 @app.route('/api/summary', methods=['GET'])
 def get_summary():
     try:
@@ -83,31 +82,11 @@ def get_summary():
         weekly_data = df.groupby('week')['amount'].sum().to_dict()
         max_weekly = max(weekly_data.values()) if weekly_data else 0
         
-        # Generate plot
-        plt.figure(figsize=(10, 6))
-        sns.set_style("darkgrid")
-        
-        if not df.empty:
-            plot_df = df.groupby('category')['amount'].sum().reset_index()
-            if not plot_df.empty:
-                sns.barplot(x='category', y='amount', data=plot_df)
-            else:
-                plt.text(0.5, 0.5, 'No data available', 
-                         ha='center', va='center', fontsize=12)
-        else:
-            plt.text(0.5, 0.5, 'No data available', 
-                     ha='center', va='center', fontsize=12)
-        
-        plt.title('Expenses by Category')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        # Save plot to buffer
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', bbox_inches='tight')
-        buffer.seek(0)
-        plot_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        plt.close()
+        # Render the chart, or reuse the cached image if the plotted data is unchanged
+        plot_totals = df.groupby('category')['amount'].sum()
+        spec = chart_spec('bar', plot_totals.index, plot_totals.values, 'Expenses by Category')
+        png = chart_cache.get_or_render(chart_key(category, spec), lambda: chart_renderer.render(spec))
+        plot_data = base64.b64encode(png).decode('utf-8')
         
         # Generate recommendations
         recommendations = [
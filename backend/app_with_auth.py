@@ -1,31 +1,53 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, send_file, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
-import pandas as pd
-import numpy as np
-import os
-import json
-from datetime import datetime, timedelta
+import csv
+import io
+from itertools import islice
+from datetime import datetime
 import base64
-import matplotlib
-matplotlib.use('Agg')  # Must be before other matplotlib imports
-import matplotlib.pyplot as plt
-import seaborn as sns
 from io import BytesIO
 from flask_cors import CORS
 import warnings
 
 # Import our models and auth blueprint
-from models import db, User, Expense
+from models import db, Expense
 from auth import auth_bp
+import aggregates
+import sql_aggregation
+import migrations
+import bulk_expenses
+import categories
+import money
+import expense_queries
+import summary_engine
+import serialization
+from chart_cache import ChartCache, chart_key
+from chart_renderer import ChartRenderService, chart_spec
 
 # Filter out UserWarnings
 warnings.filterwarnings("ignore", category=UserWarning)
 
+
+class AnalyticsJSONProvider(DefaultJSONProvider):
+    """jsonify() through serialization.dumps, which encodes NumPy and pandas values as they are"""
+
+    def dumps(self, obj, **kwargs):
+        return serialization.dumps(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys)).decode('utf-8')
+
+
 app = Flask(__name__)
+app.json = AnalyticsJSONProvider(app)
 app.config['SECRET_KEY'] = 'your-secret-key-change-this-in-production'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///expense_tracker.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = 'jwt-secret-string-change-this-in-production'
+# 'aggregates' serves summaries from the maintained aggregate store,
+# 'rows' recomputes them from every expense row
+app.config['SUMMARY_SOURCE'] = 'aggregates'
+# 'aggregates' serves /api/expenses period totals from the aggregate store,
+# 'sql' groups and sums the expense rows inside the database
+app.config['PERIOD_TOTALS_SOURCE'] = 'aggregates'
 
 # Initialize extensions
 db.init_app(app)
@@ -35,19 +57,49 @@ CORS(app)  # Enable CORS for all routes
 # Register auth blueprint
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 
-# Create tables
-with app.app_context():
-    db.create_all()
+# Rendered summary charts, keyed by a fingerprint of the plotted data
+chart_cache = ChartCache(max_bytes=64 * 1024 * 1024)
+chart_renderer = ChartRenderService()
 
-def get_user_expenses(user_id, category='all'):
-    """Get expenses for a specific user, optionally filtered by category"""
-    query = Expense.query.filter_by(user_id=user_id)
-    
-    if category != 'all':
-        query = query.filter_by(category=category)
-    
-    expenses = query.all()
-    return [expense.to_dict() for expense in expenses]
+def init_database():
+    """Create tables and bring existing databases up to date.
+
+    Called from the server entry point rather than at import: chart render
+    workers import this module as __mp_main__ and must not touch the database.
+    """
+    with app.app_context():
+        db.create_all()
+        migrations.run_migrations()
+
+CHART_MIMETYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+def category_chart_spec(plot_totals, fmt='png'):
+    """Chart spec for a bar chart of spend per category, from totals in cents"""
+    plot_series = sorted(plot_totals.items())
+    return chart_spec(
+        'bar',
+        [category for category, _ in plot_series],
+        [money.from_cents(cents) for _, cents in plot_series],
+        'Expenses by Category',
+        fmt
+    )
+
+def summary_chart_key(user_id, category, spec):
+    """Fingerprint of everything that affects a summary chart"""
+    return chart_key(user_id, category, spec)
+
+def get_cached_chart(key, spec):
+    """Return the chart image for key, rendering it in the worker pool only on a cache miss"""
+    return chart_cache.get_or_render(key, lambda: chart_renderer.render(spec))
+
+def summary_stats_from_rows(user_id, category='all', start=None, end=None):
+    """Summary statistics recomputed from the raw expense rows.
+
+    Reference path for the aggregate store; returns the same structure as
+    aggregates.get_summary_stats, or None when there is nothing to summarize.
+    One fetch of the user's rows in the date range feeds every statistic.
+    """
+    return summary_engine.summarize(expense_queries.expense_frame(user_id, start=start, end=end), category)
 
 @app.route('/api/summary', methods=['GET'])
 @jwt_required()
@@ -56,13 +108,23 @@ def get_summary():
         user_id = get_jwt_identity()
         print(f"Summary endpoint called for user {user_id} with args:", request.args)
         
-        # Get category from request args
+        # Get category and optional date range from request args
         category = request.args.get('category', 'all')
+        try:
+            start, end = expense_queries.parse_date_range(request.args)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
-        # Get user expenses
-        expenses_data = get_user_expenses(user_id, category)
+        # Get summary statistics for the user
+        if app.config['SUMMARY_SOURCE'] == 'rows':
+            summary = summary_stats_from_rows(user_id, category, start, end)
+        else:
+            summary = aggregates.get_summary_stats(user_id, category, start, end)
         
-        if not expenses_data:
+        if summary is None:
             # Return empty data structure if no expenses
             return jsonify({
                 "success": True,
@@ -80,57 +142,22 @@ def get_summary():
                 "selected_category": category
             })
         
-        # Convert to DataFrame
-        df = pd.DataFrame(expenses_data)
-        df['date'] = pd.to_datetime(df['date'])
-        df['amount'] = df['amount'].astype(float)
-        
-        # Calculate statistics
-        total = df['amount'].sum()
+        # Summaries are computed in cents; convert once for the response
+        total = money.from_cents(summary['total'])
+        avg_daily = money.from_cents(summary['avg_daily'])
+        category_totals = {k: money.from_cents(v) for k, v in summary['category_totals'].items()}
+        weekly_data = {k: money.from_cents(v) for k, v in summary['weekly_data'].items()}
+        max_weekly = max(weekly_data.values()) if weekly_data else 0
         print(f"Total amount: {total}")
-        
-        # Calculate daily average
-        avg_daily = df.groupby(df['date'].dt.date)['amount'].sum().mean()
         print(f"Daily average: {avg_daily}")
         
-        # Calculate category totals (from all user expenses, not filtered)
-        all_expenses = get_user_expenses(user_id, 'all')
-        if all_expenses:
-            category_df = pd.DataFrame(all_expenses)
-            category_totals = category_df.groupby('category')['amount'].sum().to_dict()
-        else:
-            category_totals = {}
-        
-        # Calculate weekly data from filtered data
-        df['week'] = df['date'].dt.strftime('%U')
-        weekly_data = df.groupby('week')['amount'].sum().to_dict()
-        max_weekly = max(weekly_data.values()) if weekly_data else 0
-        
-        # Generate plot
-        plt.figure(figsize=(10, 6))
-        sns.set_style("darkgrid")
-        
-        if not df.empty:
-            plot_df = df.groupby('category')['amount'].sum().reset_index()
-            if not plot_df.empty:
-                sns.barplot(x='category', y='amount', data=plot_df)
-            else:
-                plt.text(0.5, 0.5, 'No data available', 
-                         ha='center', va='center', fontsize=12)
+        # Embed the chart unless the client fetches it from /api/summary/chart
+        if request.args.get('plot', 'true').lower() in ('false', '0', 'no'):
+            plot_data = ""
         else:
-            plt.text(0.5, 0.5, 'No data available', 
-                     ha='center', va='center', fontsize=12)
-        
-        plt.title('Expenses by Category')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        # Save plot to buffer
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', bbox_inches='tight')
-        buffer.seek(0)
-        plot_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        plt.close()
+            spec = category_chart_spec(summary['plot_totals'])
+            png = get_cached_chart(summary_chart_key(user_id, category, spec), spec)
+            plot_data = base64.b64encode(png).decode('utf-8')
         
         # Generate recommendations based on user data
         recommendations = []
@@ -180,6 +207,67 @@ def get_summary():
             "error": str(e)
         }), 500
 
+@app.route('/api/summary/chart', methods=['GET'])
+@jwt_required()
+def get_summary_chart():
+    try:
+        user_id = get_jwt_identity()
+        category = request.args.get('category', 'all')
+        fmt = request.args.get('format', 'png').lower()
+        
+        if fmt not in CHART_MIMETYPES:
+            return jsonify({
+                "success": False,
+                "error": f"Unsupported chart format: {fmt}"
+            }), 400
+        try:
+            start, end = expense_queries.parse_date_range(request.args)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        # Only the plotted series is needed, not the full summary
+        if app.config['SUMMARY_SOURCE'] == 'rows' or start is not None or end is not None:
+            summary = (summary_stats_from_rows if app.config['SUMMARY_SOURCE'] == 'rows'
+                       else aggregates.get_summary_stats)(user_id, category, start, end)
+            plot_totals = summary['plot_totals'] if summary else {}
+        else:
+            plot_totals = aggregates.get_category_totals(user_id)
+            if category != 'all':
+                plot_totals = {k: v for k, v in plot_totals.items() if k == category}
+        
+        spec = category_chart_spec(plot_totals, fmt)
+        key = summary_chart_key(user_id, category, spec)
+        
+        # The fingerprint doubles as the ETag, so an unchanged chart is never re-rendered
+        if request.if_none_match.contains(key):
+            response = Response(status=304)
+            response.set_etag(key)
+            return response
+        
+        image = get_cached_chart(key, spec)
+        response = send_file(
+            BytesIO(image),
+            mimetype=CHART_MIMETYPES[fmt],
+            etag=key,
+            last_modified=chart_cache.rendered_at(key),
+            conditional=True,
+            max_age=0
+        )
+        # Browsers may keep the image but must revalidate, as expenses can change
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    
+    except Exception as e:
+        print(f"Error in summary chart endpoint: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @app.route('/api/expenses', methods=['GET'])
 @jwt_required()
 def get_expenses():
@@ -187,38 +275,25 @@ def get_expenses():
         user_id = get_jwt_identity()
         period = request.args.get('period', 'monthly')
         category = request.args.get('category', 'all')
-        
-        # Get user expenses
-        expenses_data = get_user_expenses(user_id, category)
-        
-        if not expenses_data:
+        try:
+            start, end = expense_queries.parse_date_range(request.args)
+        except ValueError as e:
             return jsonify({
-                "success": True,
-                "data": {},
-                "selected_category": category,
-                "selected_period": period
-            })
-        
-        # Convert to DataFrame
-        df = pd.DataFrame(expenses_data)
-        df['date'] = pd.to_datetime(df['date'])
-        df['amount'] = df['amount'].astype(float)
-        
-        # Group by period
-        if period == 'daily':
-            df['period'] = df['date'].dt.strftime('%Y-%m-%d')
-        elif period == 'weekly':
-            df['period'] = df['date'].dt.strftime('%Y-W%U')
-        else:  # monthly
-            df['period'] = df['date'].dt.strftime('%Y-%m')
-        
-        # Calculate totals by period
-        period_totals = df.groupby('period')['amount'].sum().to_dict()
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        # Calculate totals by period (unknown periods fall back to monthly)
+        period_key = period if period in ('daily', 'weekly') else 'monthly'
+        if app.config['PERIOD_TOTALS_SOURCE'] == 'sql':
+            period_totals = sql_aggregation.get_period_totals(user_id, period_key, category, start, end)
+        else:
+            period_totals = aggregates.get_period_totals(user_id, period_key, category, start, end)
         
         # Prepare the response
         response = {
             "success": True,
-            "data": {k: float(v) for k, v in period_totals.items()},
+            "data": {k: money.from_cents(v) for k, v in period_totals.items()},
             "selected_category": category,
             "selected_period": period
         }
@@ -249,16 +324,28 @@ def add_expense():
                     'message': f'{field} is required'
                 }), 400
         
+        try:
+            amount_cents = money.to_cents(data['amount'])
+            currency = money.parse_currency(data.get('currency'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
         # Create new expense
         expense = Expense(
             user_id=user_id,
-            amount=float(data['amount']),
+            amount_cents=amount_cents,
+            currency=currency,
             category=data['category'],
             description=data.get('description', ''),
             date=datetime.strptime(data['date'], '%Y-%m-%d').date()
         )
+        expense.category_id = categories.get_category_id(user_id, expense.category)
         
         db.session.add(expense)
+        aggregates.record_expense(expense)
         db.session.commit()
         
         return jsonify({
@@ -280,6 +367,291 @@ def add_expense():
             'error': str(e)
         }), 500
 
+IMPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+@app.route('/api/expenses/import', methods=['POST'])
+@jwt_required()
+def import_expenses():
+    """Import a CSV with date,category,amount[,description][,currency] columns.
+
+    The upload is read in chunks; each chunk is validated, inserted with one
+    executemany and committed, so memory stays flat and a bad row only skips
+    that row.
+    """
+    try:
+        user_id = get_jwt_identity()
+        
+        # Accept a multipart 'file' field or a raw text/csv body
+        upload = request.files.get('file')
+        if upload is not None:
+            stream = upload.stream
+        elif request.mimetype == 'text/csv':
+            stream = request.stream
+        else:
+            return jsonify({
+                'success': False,
+                'message': 'Upload a CSV file in the "file" field or as a text/csv body'
+            }), 400
+        
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        missing = {'date', 'category', 'amount'} - set(reader.fieldnames or [])
+        if missing:
+            return jsonify({
+                'success': False,
+                'message': f'CSV is missing columns: {", ".join(sorted(missing))}'
+            }), 400
+        
+        imported = 0
+        failed = 0
+        errors = []
+        progress = []
+        
+        while True:
+            # Pair every row with its line number for error reports
+            chunk = list(islice(((reader.line_num, row) for row in reader), IMPORT_CHUNK_SIZE))
+            if not chunk:
+                break
+            
+            valid, chunk_errors = bulk_expenses.validate_expense_records([row for _, row in chunk])
+            imported += bulk_expenses.insert_expenses(user_id, valid)
+            db.session.commit()
+            
+            failed += len(chunk_errors)
+            for position, message in chunk_errors[:MAX_REPORTED_ERRORS - len(errors)]:
+                errors.append({'line': chunk[position][0], 'message': message})
+            
+            progress.append({'rows_processed': imported + failed, 'imported': imported})
+            print(f"Import for user {user_id}: {imported + failed} rows processed, {imported} imported")
+        
+        return jsonify({
+            'success': True,
+            'message': f'Imported {imported} expenses',
+            'imported': imported,
+            'failed': failed,
+            'errors': errors,
+            'progress': progress
+        }), 200
+        
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': 'CSV must be UTF-8 encoded'
+        }), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': 'An error occurred while importing expenses',
+            'error': str(e)
+        }), 500
+
+MAX_BATCH_SIZE = 5000
+
+def get_batch_items(data, key):
+    """Items of a batch request body: either a bare list or {key: [...]}"""
+    if isinstance(data, dict):
+        data = data.get(key)
+    return data if isinstance(data, list) else None
+
+@app.route('/api/expenses/batch', methods=['POST'])
+@jwt_required()
+def add_expenses_batch():
+    """Add up to MAX_BATCH_SIZE expenses in one transaction.
+
+    Invalid items are skipped and reported; results[i] describes the i-th item.
+    """
+    try:
+        user_id = get_jwt_identity()
+        items = get_batch_items(request.get_json(silent=True), 'expenses')
+        
+        if items is None:
+            return jsonify({
+                'success': False,
+                'message': 'Request body must be a list of expenses or {"expenses": [...]}'
+            }), 400
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({
+                'success': False,
+                'message': f'At most {MAX_BATCH_SIZE} expenses per batch'
+            }), 400
+        
+        records = [item if isinstance(item, dict) else {} for item in items]
+        valid, errors = bulk_expenses.validate_expense_records(records)
+        expenses = bulk_expenses.create_expenses(user_id, valid)
+        
+        # Serialize before committing; afterwards every object would be reloaded
+        results = [None] * len(items)
+        for position, expense in zip(valid.index, expenses):
+            results[position] = {'success': True, 'expense': expense.to_dict()}
+        for position, message in errors:
+            results[position] = {'success': False, 'message': message}
+        
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'created': len(expenses),
+            'failed': len(errors),
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': 'An error occurred while adding expenses',
+            'error': str(e)
+        }), 500
+
+@app.route('/api/expenses/batch', methods=['DELETE'])
+@jwt_required()
+def delete_expenses_batch():
+    """Delete up to MAX_BATCH_SIZE expenses by id in one transaction"""
+    try:
+        user_id = get_jwt_identity()
+        items = get_batch_items(request.get_json(silent=True), 'ids')
+        
+        if items is None:
+            return jsonify({
+                'success': False,
+                'message': 'Request body must be a list of ids or {"ids": [...]}'
+            }), 400
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({
+                'success': False,
+                'message': f'At most {MAX_BATCH_SIZE} ids per batch'
+            }), 400
+        
+        # Anything that isn't an integer id simply won't be found
+        is_id = [isinstance(item, int) and not isinstance(item, bool) for item in items]
+        ids = {item for item, valid in zip(items, is_id) if valid}
+        deleted = bulk_expenses.delete_expenses(user_id, ids)
+        db.session.commit()
+        
+        results = []
+        for item, valid in zip(items, is_id):
+            if valid and item in deleted:
+                results.append({'id': item, 'success': True})
+            else:
+                results.append({'id': item, 'success': False, 'message': 'Expense not found'})
+        
+        return jsonify({
+            'success': True,
+            'deleted': len(deleted),
+            'failed': len(items) - sum(result['success'] for result in results),
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': 'An error occurred while deleting expenses',
+            'error': str(e)
+        }), 500
+
+@app.route('/api/categories', methods=['GET'])
+@jwt_required()
+def get_categories():
+    """List the user's expense categories"""
+    try:
+        user_id = get_jwt_identity()
+        return jsonify({
+            'success': True,
+            'categories': [category.to_dict() for category in categories.get_user_categories(user_id)]
+        })
+    
+    except Exception as e:
+        print(f"Error in categories endpoint: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/expenses/items', methods=['GET'])
+@jwt_required()
+def list_expense_items():
+    """List raw expenses newest first, one page at a time.
+
+    Pass the returned next_cursor as ?cursor= to fetch the following page;
+    ?fields= limits which columns are returned.
+    """
+    try:
+        user_id = get_jwt_identity()
+        category = request.args.get('category', 'all')
+
+        try:
+            fields = expense_queries.parse_fields(request.args.get('fields'))
+            start, end = expense_queries.parse_date_range(request.args)
+            limit = expense_queries.parse_limit(request.args.get('limit'))
+            items, next_cursor = expense_queries.list_expenses(
+                user_id, fields, limit, request.args.get('cursor'), category, start, end
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        return jsonify({
+            'success': True,
+            'items': items,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
+
+    except Exception as e:
+        print(f"Error in expense items endpoint: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/expenses/export', methods=['GET'])
+@jwt_required()
+def export_expenses():
+    """Stream all of the user's expenses as CSV (default) or NDJSON.
+
+    Rows are read from the database in batches and written out as they
+    arrive; accepts the same category, from and to filters as /api/expenses/items.
+    """
+    try:
+        user_id = get_jwt_identity()
+        export_format = request.args.get('format', 'csv')
+        category = request.args.get('category', 'all')
+
+        if export_format not in expense_queries.EXPORT_FORMATS:
+            return jsonify({
+                'success': False,
+                'message': f'format must be one of: {", ".join(expense_queries.EXPORT_FORMATS)}'
+            }), 400
+        try:
+            fields = expense_queries.parse_fields(request.args.get('fields'))
+            start, end = expense_queries.parse_date_range(request.args)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+
+        encode, mimetype = expense_queries.EXPORT_FORMATS[export_format]
+        rows = expense_queries.iter_expense_rows(user_id, fields, category, start, end)
+        print(f"Export endpoint called for user {user_id} with format={export_format}, category={category}")
+        return Response(
+            stream_with_context(encode(rows, fields)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename=expenses.{export_format}'}
+        )
+
+    except Exception as e:
+        print(f"Error in export endpoint: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @app.route('/api/expenses/<int:expense_id>', methods=['DELETE'])
 @jwt_required()
 def delete_expense(expense_id):
@@ -295,6 +667,7 @@ def delete_expense(expense_id):
                 'message': 'Expense not found'
             }), 404
         
+        aggregates.remove_expense(expense)
         db.session.delete(expense)
         db.session.commit()
         
@@ -329,9 +702,17 @@ if __name__ == '__main__':
     print("    - GET /api/auth/verify-token - Verify JWT token")
     print("  Expenses (require authentication):")
     print("    - GET /api/summary - Get summary statistics and visualizations")
+    print("    - GET /api/summary/chart - Get the summary chart as PNG or SVG")
     print("    - GET /api/expenses - Get expense data by period")
+    print("    - GET /api/categories - List your expense categories")
+    print("    - GET /api/expenses/items - List expenses page by page")
+    print("    - GET /api/expenses/export - Download expenses as CSV or NDJSON")
     print("    - POST /api/expenses - Add new expense")
+    print("    - POST /api/expenses/import - Import expenses from a CSV file")
+    print("    - POST /api/expenses/batch - Add many expenses in one request")
+    print("    - DELETE /api/expenses/batch - Delete many expenses in one request")
     print("    - DELETE /api/expenses/<id> - Delete expense")
     print("  General:")
     print("    - GET /api/test - Test if the API is working")
+    init_database()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
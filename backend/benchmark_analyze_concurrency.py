@@ -0,0 +1,95 @@
+"""Load test for concurrent /api/analyze-expenses requests.
+
+Runs the FastAPI app in-process against a synthetic expenses file and fires
+bursts of concurrent requests with a cold cache, comparing:
+
+  blocking  - the analysis computed directly inside the async handler, as
+              analyze_expenses() used to do
+  offloaded - the real endpoint: executor + request coalescing
+
+For each burst it reports wall time, throughput and the latency of a cheap
+probe request sent during the burst, which shows whether the event loop was
+free to serve other clients.
+
+Usage: python benchmark_analyze_concurrency.py [rows]   (default: 200000)
+Requires httpx.
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import httpx
+from fastapi import Response
+
+import main
+from expense_rollups import RollupStore
+
+CATEGORIES = ['Groceries', 'Transport', 'Entertainment', 'Utilities', 'Shopping', 'Dining', 'Health']
+CONCURRENCY = [1, 8, 32]
+
+
+@main.app.post("/benchmark/analyze-blocking")
+async def analyze_blocking():
+    body = main.rollups.derived('analysis', main.analysis_body)
+    return Response(content=body, media_type='application/json')
+
+
+@main.app.get("/benchmark/ping")
+async def ping():
+    return {"ok": True}
+
+
+def write_csv(path, rows):
+    start = date(2020, 1, 1)
+    with open(path, 'w') as f:
+        f.write('date,category,amount\n')
+        for _ in range(rows):
+            day = start + timedelta(days=random.randint(0, 4 * 365))
+            f.write(f"{day.isoformat()},{random.choice(CATEGORIES)},{random.uniform(1, 200):.2f}\n")
+
+
+async def burst(client, path, concurrency, csv_path):
+    # Fresh rollups: every burst starts from a cold cache
+    main.rollups = RollupStore(csv_path)
+
+    async def probe():
+        # Sent 10 ms into the burst; a blocked event loop delays both the send and the reply
+        sent = time.perf_counter() + 0.01
+        await asyncio.sleep(0.01)
+        await client.get('/benchmark/ping')
+        return time.perf_counter() - sent
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        probe(), *[client.post(path) for _ in range(concurrency)]
+    )
+    elapsed = time.perf_counter() - start
+    assert all(response.status_code == 200 for response in results[1:])
+    return elapsed, results[0]
+
+
+async def measure(csv_path):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark', timeout=None) as client:
+        print(f"{'mode':<10} {'requests':>8} {'wall (s)':>9} {'req/s':>8} {'probe (ms)':>11}")
+        for mode, path in [('blocking', '/benchmark/analyze-blocking'), ('offloaded', '/api/analyze-expenses')]:
+            for concurrency in CONCURRENCY:
+                elapsed, probe = await burst(client, path, concurrency, csv_path)
+                print(f"{mode:<10} {concurrency:>8} {elapsed:>9.3f} {concurrency / elapsed:>8.1f} {probe * 1000:>11.1f}")
+
+
+def run_benchmark():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    random.seed(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'expenses.csv')
+        write_csv(csv_path, rows)
+        asyncio.run(measure(csv_path))
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,94 @@
+"""Benchmark expense queries with and without the composite indexes.
+
+Builds an in-memory SQLite expense table at several sizes, with every user
+owning 1,000 expenses so the table grows with the user base while each
+caller's data stays the same size, and times the queries the API issues
+before and after creating the indexes from models.Expense.
+
+Usage: python benchmark_indexes.py [sizes...]   (default: 10000 100000 1000000)
+"""
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+EXPENSES_PER_USER = 1000
+CATEGORIES = ['Food', 'Transport', 'Entertainment', 'Utilities', 'Shopping']
+REPEAT = 20
+
+QUERIES = {
+    'user expenses': (
+        "SELECT id, amount, category, description, date FROM expense "
+        "WHERE user_id = ? ORDER BY date", lambda user_id: (user_id,)
+    ),
+    'user + category': (
+        "SELECT id, amount, category, description, date FROM expense "
+        "WHERE user_id = ? AND category_id = ? ORDER BY date", lambda user_id: (user_id, 1)
+    ),
+    'monthly totals': (
+        "SELECT strftime('%Y', date), strftime('%m', date), sum(amount) FROM expense "
+        "WHERE user_id = ? GROUP BY 1, 2", lambda user_id: (user_id,)
+    ),
+}
+
+INDEXES = [
+    "CREATE INDEX ix_expense_user_date ON expense (user_id, date)",
+    "CREATE INDEX ix_expense_user_category_id_date ON expense (user_id, category_id, date)",
+]
+
+
+def build_table(size):
+    conn = sqlite3.connect(':memory:')
+    conn.execute(
+        "CREATE TABLE expense (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+        "amount FLOAT NOT NULL, category VARCHAR(50) NOT NULL, category_id INTEGER, description VARCHAR(200), "
+        "date DATE NOT NULL, created_at DATETIME)"
+    )
+    users = max(1, size // EXPENSES_PER_USER)
+    start = date(2023, 1, 1)
+    rows = (
+        (random.randint(1, users), round(random.uniform(1, 200), 2), category, category_id,
+         '', (start + timedelta(days=random.randint(0, 729))).isoformat())
+        for category_id, category in (random.choice(list(enumerate(CATEGORIES, 1))) for _ in range(size))
+    )
+    conn.executemany(
+        "INSERT INTO expense (user_id, amount, category, category_id, description, date) "
+        "VALUES (?, ?, ?, ?, ?, ?)", rows
+    )
+    conn.commit()
+    return conn, users
+
+
+def time_queries(conn, users):
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        user_ids = [random.randint(1, users) for _ in range(REPEAT)]
+        start = time.perf_counter()
+        for user_id in user_ids:
+            conn.execute(sql, params(user_id)).fetchall()
+        results[name] = (time.perf_counter() - start) / REPEAT * 1000
+    return results
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    random.seed(42)
+
+    print(f"{'rows':>10} {'query':<18} {'no index (ms)':>14} {'indexed (ms)':>13} {'speedup':>8}")
+    for size in sizes:
+        conn, users = build_table(size)
+        before = time_queries(conn, users)
+        for statement in INDEXES:
+            conn.execute(statement)
+        conn.execute("ANALYZE")
+        after = time_queries(conn, users)
+        conn.close()
+
+        for name in QUERIES:
+            print(f"{size:>10} {name:<18} {before[name]:>14.3f} {after[name]:>13.3f} "
+                  f"{before[name] / after[name]:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Microbenchmark of the analytics read path.
+
+Compares loading a user's expenses into a DataFrame the old way (full
+Expense ORM objects, to_dict() with isoformat(), then pd.to_datetime on the
+strings) with expense_queries.expense_frame(), which selects only date,
+category and amount as tuples and builds NumPy columns directly.
+
+Usage: python benchmark_lean_reads.py [rows]   (default: 100000)
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+from flask import Flask
+
+from models import db, User, Expense
+import categories
+import expense_queries
+
+CATEGORIES = ['Food', 'Transport', 'Entertainment', 'Utilities', 'Shopping']
+REPEAT = 5
+
+
+def orm_frame(user_id):
+    expenses = Expense.query.filter_by(user_id=user_id).all()
+    df = pd.DataFrame([expense.to_dict() for expense in expenses])
+    df['date'] = pd.to_datetime(df['date'])
+    df['amount'] = df['amount'].astype(float)
+    return df
+
+
+def lean_frame(user_id):
+    return expense_queries.expense_frame(user_id)
+
+
+def populate(rows):
+    user = User(email='benchmark@example.com', first_name='Bench', last_name='Mark')
+    user.set_password('benchmark')
+    db.session.add(user)
+    db.session.flush()
+
+    start = date(2020, 1, 1)
+    category_ids = categories.get_category_ids(user.id, CATEGORIES)
+    db.session.execute(Expense.__table__.insert(), [
+        {'user_id': user.id, 'amount_cents': random.randint(100, 20000),
+         'category': category, 'category_id': category_ids[category], 'description': '',
+         'date': start + timedelta(days=random.randint(0, 4 * 365))}
+        for category in (random.choice(CATEGORIES) for _ in range(rows))
+    ])
+    db.session.commit()
+    return user.id
+
+
+def best_of(load, user_id):
+    times = []
+    for _ in range(REPEAT):
+        # A clean session each time, as in a fresh request
+        db.session.remove()
+        start = time.perf_counter()
+        frame = load(user_id)
+        times.append(time.perf_counter() - start)
+    return min(times), frame
+
+
+def run_benchmark():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tmp, 'benchmark.db')
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            user_id = populate(rows)
+
+            orm_time, orm_df = best_of(orm_frame, user_id)
+            lean_time, lean_df = best_of(lean_frame, user_id)
+            assert round(orm_df['amount'].sum() * 100) == lean_df['amount_cents'].sum()
+            db.session.remove()
+
+    print(f"{'path':<6} {'rows':>8} {'best (ms)':>10}")
+    print(f"{'orm':<6} {rows:>8} {orm_time * 1000:>10.1f}")
+    print(f"{'lean':<6} {rows:>8} {lean_time * 1000:>10.1f}")
+    print(f"speedup: {orm_time / lean_time:.1f}x")
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,75 @@
+"""Benchmark of the per-cell spend recommendations.
+
+Compares the row-wise DataFrame.apply that expense_analyser.py used to run
+over every (period, category) cell with spend_recommendations.recommend(),
+which classifies whole columns with np.select, and checks that both give
+the same message for every cell. The apply path runs once per size since it
+takes seconds at a million cells.
+
+Usage: python benchmark_recommendations.py [cells...]   (default: 10000 100000 1000000)
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import spend_recommendations
+
+CATEGORIES = ['Food', 'Transport', 'Entertainment', 'Utilities', 'Shopping', 'Dining', 'Health', 'Travel']
+REPEAT = 5
+
+
+def generate_recommendation(amount, avg):
+    """The previous per-cell classification"""
+    if amount > avg * 1.5:
+        return "⚠️ High spending. Consider reducing."
+    elif amount < avg * 0.5 and amount > 0:
+        return "✅ Low spending. Great job!"
+    else:
+        return "Normal spending."
+
+
+def apply_recommendations(spend):
+    category_avg = spend.groupby('category')['amount'].mean()
+    return spend.apply(
+        lambda row: generate_recommendation(row['amount'], category_avg[row['category']]), axis=1
+    )
+
+
+def make_spend(cells):
+    """A densified long-format table: every period x category, mostly zeros"""
+    periods = -(-cells // len(CATEGORIES))
+    amounts = np.where(np.random.rand(periods * len(CATEGORIES)) < 0.3,
+                       np.random.randint(100, 20000, periods * len(CATEGORIES)) / 100, 0.0)
+    return pd.DataFrame({
+        'date': np.repeat(pd.date_range('1970-01-01', periods=periods, freq='D'), len(CATEGORIES)),
+        'category': np.tile(CATEGORIES, periods),
+        'amount': amounts,
+    }).head(cells)
+
+
+def timed(func, spend, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(spend)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    np.random.seed(42)
+
+    print(f"{'cells':>10} {'apply (ms)':>12} {'np.select (ms)':>15} {'speedup':>8}")
+    for size in sizes:
+        spend = make_spend(size)
+        before, expected = timed(apply_recommendations, spend, 1)
+        after, actual = timed(spend_recommendations.recommend, spend, REPEAT)
+        assert (actual.astype(str) == expected).all()
+        print(f"{size:>10} {before * 1000:>12.1f} {after * 1000:>15.2f} {before / after:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
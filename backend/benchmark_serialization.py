@@ -0,0 +1,86 @@
+"""Benchmark of encoding the analyze-expenses response.
+
+Compares the previous encoding (to_dict(orient='records') per wide spend
+table, then FastAPI's jsonable_encoder and JSONResponse) with
+serialization.dumps() on the frames, as records and as columns, for the
+wide and the sparse long layouts. Reports the time to encode the whole
+response and the payload size, for synthetic rollups of a number of days
+and categories where each category has spending on ACTIVE_SHARE of the days.
+
+Usage: python benchmark_serialization.py [days...]   (default: 365 3650 36500)
+"""
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from expense_rollups import ExpenseRollups
+from main import build_analysis
+import serialization
+
+CATEGORIES = 40
+ACTIVE_SHARE = 0.05
+REPEAT = 5
+
+
+def make_rollups(days):
+    index = pd.date_range('1970-01-01', periods=days, freq='D', name='date')
+    cents = np.random.randint(100, 20000, (days, CATEGORIES)) * (np.random.rand(days, CATEGORIES) < ACTIVE_SHARE)
+    daily = pd.DataFrame(cents, index=index,
+                         columns=pd.Index([f'Category {i}' for i in range(CATEGORIES)], name='category'))
+    spend = daily.stack()
+    return ExpenseRollups(spend[spend != 0].astype(np.int64), pd.Series(np.random.randint(1, 10, days), index=index))
+
+
+def encode_previous(response):
+    """The previous path: a dict per row, then FastAPI's encoder"""
+    response = dict(response)
+    for key in ('dailySpend', 'weeklySpend', 'monthlySpend', 'yearlySpend'):
+        records = response[key].reset_index().to_dict(orient='records')
+        if key == 'dailySpend':
+            for record in records:
+                record['date'] = record['date'].strftime('%Y-%m-%d')
+        response[key] = records
+    return JSONResponse(jsonable_encoder(response)).body
+
+
+def best_of(encode, response):
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        body = encode(response)
+        times.append(time.perf_counter() - start)
+    return min(times), body
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [365, 3650, 36500]
+    np.random.seed(42)
+    encoders = [
+        ('wide', 'previous', encode_previous),
+        ('wide', 'dumps records', lambda response: serialization.dumps(response)),
+        ('wide', 'dumps columns', lambda response: serialization.dumps(response, 'columns')),
+        ('long', 'dumps records', lambda response: serialization.dumps(response)),
+        ('long', 'dumps columns', lambda response: serialization.dumps(response, 'columns')),
+    ]
+    print(f"orjson: {'yes' if serialization.orjson is not None else 'no (json module)'}")
+    print(f"{'days':>8} {'layout':<7} {'encoder':<14} {'time (ms)':>10} {'size (KB)':>10}")
+    for days in sizes:
+        rollups = make_rollups(days)
+        responses = {layout: build_analysis(rollups, layout) for layout in ('wide', 'long')}
+        baseline = None
+        for layout, name, encode in encoders:
+            elapsed, body = best_of(encode, responses[layout])
+            if baseline is None:
+                baseline = json.loads(body)
+            elif (layout, name) == ('wide', 'dumps records'):
+                assert json.loads(body) == baseline
+            print(f"{days:>8} {layout:<7} {name:<14} {elapsed * 1000:>10.2f} {len(body) / 1024:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
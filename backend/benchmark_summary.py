@@ -0,0 +1,95 @@
+"""Benchmark of the summary computation for large users.
+
+Compares the multi-pass pandas summary that /api/summary used to run (a
+filtered frame and an unfiltered frame, then separate groupbys for daily,
+weekly, category and plot totals) with summary_engine.summarize(), which
+takes every statistic from one frame with np.bincount over integer cents.
+Both run on the same in-memory frames, so the timings exclude the database
+fetch the old path also had to do twice.
+
+Usage: python benchmark_summary.py [sizes...]   (default: 10000 100000 1000000)
+"""
+import math
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import money
+import summary_engine
+
+CATEGORIES = ['Food', 'Transport', 'Entertainment', 'Utilities', 'Shopping', 'Dining', 'Health']
+REPEAT = 5
+
+
+def multi_pass_summary(frame, category='all'):
+    """The previous summary_stats_from_rows computation, on float amounts"""
+    df = (frame if category == 'all' else frame[frame['category'] == category]).copy()
+    if df.empty:
+        return None
+
+    total = df['amount'].sum()
+    avg_daily = df.groupby(df['date'].dt.date)['amount'].sum().mean()
+    category_totals = frame.groupby('category')['amount'].sum().to_dict()
+    df['week'] = df['date'].dt.strftime('%U')
+    weekly_data = df.groupby('week')['amount'].sum().to_dict()
+
+    return {
+        "total": total,
+        "avg_daily": avg_daily,
+        "weekly_data": weekly_data,
+        "category_totals": category_totals,
+        "plot_totals": df.groupby('category')['amount'].sum().to_dict()
+    }
+
+
+def make_frame(rows):
+    start = np.datetime64('2020-01-01')
+    amount_cents = np.random.randint(100, 20000, rows)
+    return pd.DataFrame({
+        'date': (start + np.random.randint(0, 4 * 365, rows)).astype('datetime64[ns]'),
+        'category': np.array(CATEGORIES, dtype=object)[np.random.randint(0, len(CATEGORIES), rows)],
+        'amount_cents': amount_cents,
+        'amount': amount_cents / money.CENTS_PER_UNIT,
+    })
+
+
+def assert_same(expected, actual):
+    # expected is in currency units, actual in cents
+    for key, value in expected.items():
+        if isinstance(value, dict):
+            assert value.keys() == actual[key].keys(), key
+            assert all(math.isclose(v, money.from_cents(actual[key][k])) for k, v in value.items()), key
+        else:
+            assert math.isclose(value, money.from_cents(actual[key])), key
+
+
+def best_of(summarize, frame, category):
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = summarize(frame, category)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    np.random.seed(42)
+    random.seed(42)
+
+    print(f"{'rows':>10} {'category':<10} {'multi-pass (ms)':>16} {'single-pass (ms)':>17} {'speedup':>8}")
+    for size in sizes:
+        frame = make_frame(size)
+        for category in ['all', random.choice(CATEGORIES)]:
+            before, expected = best_of(multi_pass_summary, frame, category)
+            after, actual = best_of(summary_engine.summarize, frame, category)
+            assert_same(expected, actual)
+            print(f"{size:>10} {category:<10} {before * 1000:>16.2f} {after * 1000:>17.2f} "
+                  f"{before / after:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Validation and insertion of many expenses at once.
+
+Rows are validated column-wise with pandas rather than one by one, and
+inserted with a single executemany per batch, with the aggregate store
+updated from the same rows. Nothing here commits; callers decide how many
+batches go into a transaction.
+"""
+import numpy as np
+import pandas as pd
+
+from models import db, Expense
+import aggregates
+import categories
+import money
+
+MAX_CATEGORY_LENGTH = 50
+MAX_DESCRIPTION_LENGTH = 200
+
+
+def validate_expense_records(records):
+    """Validate a list of expense dicts (date, category, amount, description, currency).
+
+    Returns (valid, errors): a DataFrame of the valid rows with typed
+    'date', 'category', 'amount_cents', 'currency' and 'description'
+    columns, indexed by position in records, and a list of
+    (position, message) for the rest.
+    """
+    frame = pd.DataFrame.from_records(records, columns=['date', 'category', 'amount', 'description', 'currency'])
+    frame.index = range(len(records))
+    # Blank cells (common in CSV) count as missing
+    frame[['date', 'amount']] = frame[['date', 'amount']].replace(r'^\s*$', np.nan, regex=True)
+
+    amount = pd.to_numeric(frame['amount'], errors='coerce')
+    dates = pd.to_datetime(frame['date'], format='%Y-%m-%d', errors='coerce')
+    category = frame['category'].where(frame['category'].notna(), '').astype(str).str.strip()
+    description = frame['description'].where(frame['description'].notna(), '').astype(str)
+    currency = frame['currency'].where(frame['currency'].notna(), '').astype(str).str.strip().str.upper()
+    currency = currency.where(currency != '', money.DEFAULT_CURRENCY)
+    amount_cents = amount.to_numpy(dtype=float) * money.CENTS_PER_UNIT
+
+    # First failing check wins for each row, in this order
+    checks = [
+        (frame['amount'].isna(), 'amount is required'),
+        (~(np.abs(amount_cents) < money.MAX_CENTS), 'Invalid amount'),
+        (frame['date'].isna(), 'date is required'),
+        (dates.isna(), 'Invalid date format. Use YYYY-MM-DD'),
+        (category == '', 'category is required'),
+        (category.str.len() > MAX_CATEGORY_LENGTH, f'category must be at most {MAX_CATEGORY_LENGTH} characters'),
+        (description.str.len() > MAX_DESCRIPTION_LENGTH, f'description must be at most {MAX_DESCRIPTION_LENGTH} characters'),
+        (~currency.str.match(money.CURRENCY_PATTERN), 'Invalid currency. Use a 3-letter ISO 4217 code'),
+    ]
+    message = pd.Series(np.select([np.asarray(mask) for mask, _ in checks],
+                                  [text for _, text in checks], default=''),
+                        index=frame.index)
+    invalid = message != ''
+
+    errors = list(zip(frame.index[invalid].tolist(), message[invalid].tolist()))
+    valid = pd.DataFrame({
+        'date': dates[~invalid].dt.date,
+        'category': category[~invalid],
+        'amount_cents': money.to_cents_array(amount[~invalid]),
+        'currency': currency[~invalid],
+        'description': description[~invalid],
+    })
+    return valid, errors
+
+
+def insert_expenses(user_id, valid):
+    """Insert validated rows for a user with one executemany and update aggregates"""
+    if valid.empty:
+        return 0
+
+    category_ids = categories.get_category_ids(user_id, valid['category'].unique())
+    rows = [
+        {'user_id': user_id, 'date': expense_date, 'category': category,
+         'category_id': category_ids[category], 'amount_cents': cents,
+         'currency': currency, 'description': description}
+        for expense_date, category, cents, currency, description in zip(
+            valid['date'], valid['category'], valid['amount_cents'].tolist(),
+            valid['currency'], valid['description']
+        )
+    ]
+    db.session.execute(Expense.__table__.insert(), rows)
+    aggregates.record_expenses(user_id, zip(valid['date'], valid['category'], valid['amount_cents'].tolist()))
+    return len(rows)
+
+
+def create_expenses(user_id, valid):
+    """Create validated rows as Expense objects, flushed so their ids are known"""
+    category_ids = categories.get_category_ids(user_id, valid['category'].unique())
+    expenses = [
+        Expense(user_id=user_id, date=expense_date, category=category,
+                category_id=category_ids[category], amount_cents=cents,
+                currency=currency, description=description)
+        for expense_date, category, cents, currency, description in zip(
+            valid['date'], valid['category'], valid['amount_cents'].tolist(),
+            valid['currency'], valid['description']
+        )
+    ]
+    db.session.add_all(expenses)
+    db.session.flush()
+    aggregates.record_expenses(user_id, [(e.date, e.category, e.amount_cents) for e in expenses])
+    return expenses
+
+
+def delete_expenses(user_id, expense_ids):
+    """Delete the user's expenses among expense_ids; returns the ids actually deleted"""
+    table = Expense.__table__
+    expense_ids = list(expense_ids)
+    found = []
+    for start in range(0, len(expense_ids), aggregates.LOOKUP_BATCH_SIZE):
+        found.extend(db.session.query(Expense.id, Expense.date, Expense.category, Expense.amount_cents).filter(
+            Expense.user_id == user_id,
+            Expense.id.in_(expense_ids[start:start + aggregates.LOOKUP_BATCH_SIZE])
+        ))
+
+    deleted = [expense_id for expense_id, _, _, _ in found]
+    for start in range(0, len(deleted), aggregates.LOOKUP_BATCH_SIZE):
+        db.session.execute(table.delete().where(table.c.id.in_(deleted[start:start + aggregates.LOOKUP_BATCH_SIZE])))
+    aggregates.remove_expenses(user_id, [(expense_date, category, cents) for _, expense_date, category, cents in found])
+    return set(deleted)
@@ -0,0 +1,82 @@
+"""Per-user category dictionary.
+
+Each distinct category name a user has is stored once in the category table
+and expenses refer to it by integer id, so filters and indexes work on small
+integers and analytics group on dense integer codes rather than strings.
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from models import db, Category
+
+LOOKUP_BATCH_SIZE = 500
+
+
+def _lookup(user_id, names):
+    ids = {}
+    for start in range(0, len(names), LOOKUP_BATCH_SIZE):
+        ids.update(db.session.query(Category.name, Category.id).filter(
+            Category.user_id == user_id,
+            Category.name.in_(names[start:start + LOOKUP_BATCH_SIZE])
+        ))
+    return ids
+
+
+def _insert_categories(table):
+    """INSERT of new categories that skips names another writer created first.
+
+    Two writers can both miss a new name in the lookup; the second insert
+    is skipped instead of violating uq_category_user_name.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        return mysql.insert(table).prefix_with('IGNORE')
+    if dialect in ('postgresql', 'sqlite'):
+        statement = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        return statement.on_conflict_do_nothing(index_elements=['user_id', 'name'])
+    return table.insert()
+
+
+def get_category_ids(user_id, names):
+    """Map category names to the user's category ids, creating missing categories"""
+    names = sorted(set(names))
+    ids = _lookup(user_id, names)
+    missing = [name for name in names if name not in ids]
+    if missing:
+        db.session.execute(_insert_categories(Category.__table__),
+                           [{'user_id': user_id, 'name': name} for name in missing])
+        ids.update(_lookup(user_id, missing))
+    return ids
+
+
+def get_category_id(user_id, name):
+    return get_category_ids(user_id, [name])[name]
+
+
+def category_id_query(user_id, name):
+    """Scalar subquery for the id of a user's category, for use in filters"""
+    return db.session.query(Category.id).filter(
+        Category.user_id == user_id, Category.name == name
+    ).scalar_subquery()
+
+
+def get_user_categories(user_id):
+    """The user's categories, sorted by name"""
+    return Category.query.filter_by(user_id=user_id).order_by(Category.name).all()
+
+
+def categorical(user_id, category_ids):
+    """A Categorical of names for an array of the user's category ids.
+
+    Codes index the user's categories sorted by name, so they are dense
+    and ordered the same way as a sorted factorize of the names would be.
+    """
+    categories = db.session.query(Category.id, Category.name).filter(
+        Category.user_id == user_id
+    ).order_by(Category.name).all()
+    ids = pd.Index([category_id for category_id, _ in categories], dtype=np.int64)
+    # Position of each id among the user's categories (-1, i.e. NaN, for any other id);
+    # from_codes stores the codes in the smallest integer dtype that fits len(ids)
+    codes = ids.get_indexer(np.asarray(category_ids, dtype=np.int64))
+    return pd.Categorical.from_codes(codes, [name for _, name in categories])
@@ -0,0 +1,73 @@
+"""In-memory cache of rendered chart images.
+
+Rendering a matplotlib figure and saving it as PNG costs hundreds of
+milliseconds, while the data behind a dashboard chart rarely changes between
+loads. Charts are cached under a fingerprint of everything that affects the
+image (user, filter, plotted series, chart style), so a repeat request returns
+the stored bytes and only a change in the data triggers a new render.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+def chart_key(*parts):
+    """Fingerprint the inputs of a chart; equal inputs give equal keys"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ChartCache:
+    """Thread-safe LRU cache of image bytes bounded by total size"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def rendered_at(self, key):
+        """UTC time the cached image for key was stored, or None if not cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry else None
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key)[0])
+            self._entries[key] = (data, datetime.now(timezone.utc))
+            self.size += len(data)
+            # Evict least recently used charts until back under budget
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def get_or_render(self, key, render):
+        """Return the cached image for key, calling render() to create it on a miss"""
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
@@ -0,0 +1,132 @@
+"""Chart rendering off the request thread.
+
+Charts are described by a plain dict spec and rendered in a pool of worker
+processes with matplotlib's object-oriented Figure API, so the web server
+never touches pyplot's global state and several renders can run in
+parallel on different cores. A spec looks like:
+
+    {
+        'kind': 'bar',              # 'bar' (by category), 'trend' (over time) or 'donut'
+        'labels': ['Food', ...],
+        'values': [120.5, ...],
+        'title': 'Expenses by Category',
+        'format': 'png',            # or 'svg'
+        'style': 'darkgrid',        # seaborn axes style
+        'figsize': [10, 6],
+    }
+
+Specs only contain JSON-friendly values, so they double as chart cache keys.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+import threading
+
+from matplotlib.figure import Figure
+import seaborn as sns
+
+DEFAULT_STYLE = 'darkgrid'
+DEFAULT_FIGSIZE = [10, 6]
+
+
+def chart_spec(kind, labels, values, title, fmt='png', **options):
+    """Build a chart spec with the default style filled in"""
+    spec = {
+        'kind': kind,
+        'labels': [str(label) for label in labels],
+        'values': [float(value) for value in values],
+        'title': title,
+        'format': fmt,
+        'style': DEFAULT_STYLE,
+        'figsize': DEFAULT_FIGSIZE,
+    }
+    spec.update(options)
+    return spec
+
+
+def render_chart(spec):
+    """Render a chart spec and return the image bytes"""
+    kind = spec.get('kind', 'bar')
+    labels = spec.get('labels', [])
+    values = spec.get('values', [])
+
+    with sns.axes_style(spec.get('style', DEFAULT_STYLE)):
+        fig = Figure(figsize=tuple(spec.get('figsize', DEFAULT_FIGSIZE)))
+        ax = fig.subplots()
+
+        if not labels:
+            ax.text(0.5, 0.5, 'No data available',
+                    ha='center', va='center', fontsize=12, transform=ax.transAxes)
+        elif kind == 'donut':
+            ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=90,
+                   wedgeprops={'width': 0.4})
+            ax.axis('equal')
+        else:
+            sns.barplot(x=labels, y=values, ax=ax)
+            ax.set_xlabel(spec.get('xlabel', 'date' if kind == 'trend' else 'category'))
+            ax.set_ylabel('amount')
+            ax.tick_params(axis='x', labelrotation=45)
+
+        ax.set_title(spec.get('title', ''))
+        fig.tight_layout()
+
+        buffer = BytesIO()
+        fig.savefig(buffer, format=spec.get('format', 'png'), bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def _mp_context():
+    """Start method for render workers.
+
+    Workers must not inherit the web server's threads or locks, so they are
+    never plain forks. forkserver forks them from a single-threaded server
+    that has already imported this module (matplotlib and seaborn included);
+    spawn, where forkserver is unavailable (Windows), starts each from scratch.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['chart_renderer'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class ChartRenderService:
+    """Renders chart specs in a pool of worker processes.
+
+    The pool is started on first use. With max_workers=0 charts are rendered
+    in the calling thread instead, which is handy for debugging.
+    """
+
+    def __init__(self, max_workers=None, timeout=30):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_mp_context())
+            return self._executor
+
+    def submit(self, spec):
+        """Start rendering a spec, returning a Future for the image bytes"""
+        return self._pool().submit(render_chart, spec)
+
+    def render(self, spec):
+        """Render a spec and wait for the image bytes"""
+        if self.max_workers == 0:
+            return render_chart(spec)
+        try:
+            return self.submit(spec).result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool and retry once
+            self.shutdown()
+            return self.submit(spec).result(timeout=self.timeout)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
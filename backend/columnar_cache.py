@@ -0,0 +1,144 @@
+"""Columnar binary cache of an expenses file.
+
+Parsing CSV text and dates dominates load time for long histories. The first
+load of expenses.csv (or expenses.json) writes its columns as NumPy arrays
+next to the source:
+
+    .expense_cache/<source name>/
+        date.npy         int32 days since 1970-01-01
+        amount_cents.npy int64 cents (see money.py)
+        category.npy     codes into categories.json, the smallest signed integer
+                         type that fits the number of categories
+        categories.json  category names
+        meta.json        source mtime/size the arrays were built from
+
+Later loads memory-map the arrays instead of parsing, and the cache is
+rebuilt automatically whenever the source file's mtime or size changes.
+A build parses exactly the bytes its recorded size covers, so rows appended
+while it runs are left for the next build (or, for RollupStore, for its
+append path).
+"""
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import money
+
+CACHE_DIR_NAME = '.expense_cache'
+# 3: amount_cents rounded half up on the decimal amounts (money.to_cents_array)
+# 4: category codes sized to the number of categories instead of always int16
+FORMAT_VERSION = 4
+
+
+class ColumnarExpenses:
+    """Expense columns: epoch days, amounts in cents and dictionary-encoded categories"""
+
+    def __init__(self, days, amount_cents, category_codes, categories, signature=None):
+        self.days = days
+        self.amount_cents = amount_cents
+        self.category_codes = category_codes
+        self.categories = categories
+        # Source mtime/size the columns were built from
+        self.signature = signature
+
+    def __len__(self):
+        return len(self.days)
+
+    def to_frame(self):
+        """DataFrame with datetime64 'date', Categorical 'category', int64
+        'amount_cents' and, for display, float 'amount' in currency units"""
+        return pd.DataFrame({
+            'date': pd.to_datetime(self.days, unit='D'),
+            'category': pd.Categorical.from_codes(self.category_codes, self.categories),
+            'amount_cents': self.amount_cents,
+            'amount': self.amount_cents / money.CENTS_PER_UNIT,
+        })
+
+
+def cache_dir_for(source):
+    return os.path.join(os.path.dirname(os.path.abspath(source)), CACHE_DIR_NAME, os.path.basename(source))
+
+
+def _source_signature(source):
+    stat = os.stat(source)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'version': FORMAT_VERSION}
+
+
+def clean_expenses(data):
+    """Type the amount and date columns of raw expense rows, dropping invalid rows"""
+    data['amount'] = pd.to_numeric(data['amount'], errors='coerce')
+    data['date'] = pd.to_datetime(data['date'], errors='coerce')
+    return data.dropna(subset=['amount', 'date'])
+
+
+def _read_source(source, size):
+    """Parse the first size bytes of the source"""
+    with open(source, 'rb') as f:
+        content = io.BytesIO(f.read(size))
+    if source.endswith('.json'):
+        data = pd.read_json(content)
+    else:
+        data = pd.read_csv(content)
+    return clean_expenses(data)
+
+
+def _write_atomic(path, write):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def build(source, cache_dir=None):
+    """Parse the source file and write its columnar cache; returns the signature it was built from"""
+    cache_dir = cache_dir or cache_dir_for(source)
+    os.makedirs(cache_dir, exist_ok=True)
+    signature = _source_signature(source)
+
+    data = _read_source(source, signature['size'])
+    # Missing categories get code -1, which Categorical reads back as NaN
+    codes, categories = pd.factorize(data['category'], sort=True)
+    columns = {
+        'date': data['date'].values.astype('datetime64[D]').astype(np.int32),
+        'amount_cents': money.to_cents_array(data['amount']),
+        # Signed so the -1 of missing categories survives; -len also fits len - 1
+        'category': codes.astype(np.min_scalar_type(-max(len(categories), 1))),
+    }
+
+    for name, values in columns.items():
+        _write_atomic(os.path.join(cache_dir, f'{name}.npy'), lambda f, values=values: np.save(f, values))
+    _write_atomic(os.path.join(cache_dir, 'categories.json'),
+                  lambda f: f.write(json.dumps([str(category) for category in categories]).encode('utf-8')))
+    # Written last: a cache is only valid once its metadata matches the source
+    _write_atomic(os.path.join(cache_dir, 'meta.json'),
+                  lambda f: f.write(json.dumps(signature).encode('utf-8')))
+    return signature
+
+
+def _cached_signature(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load(source, cache_dir=None):
+    """Load an expenses file through its columnar cache, rebuilding it if stale"""
+    cache_dir = cache_dir or cache_dir_for(source)
+    signature = _cached_signature(cache_dir)
+    if signature != _source_signature(source):
+        signature = build(source, cache_dir)
+
+    with open(os.path.join(cache_dir, 'categories.json')) as f:
+        categories = json.load(f)
+    return ColumnarExpenses(
+        np.load(os.path.join(cache_dir, 'date.npy'), mmap_mode='r'),
+        np.load(os.path.join(cache_dir, 'amount_cents.npy'), mmap_mode='r'),
+        np.load(os.path.join(cache_dir, 'category.npy'), mmap_mode='r'),
+        categories,
+        signature,
+    )
@@ -1,167 +1,235 @@
-import pandas as pd
-from sklearn.preprocessing import LabelEncoder
-import matplotlib.pyplot as plt
-import seaborn as sns
+"""Spend analysis of an expenses file: per-period spend by category with
+recommendations, per-category suggestions, and period comparisons.
+
+ExpenseAnalyzer takes a DataFrame (or arrays) of expenses and returns
+DataFrames and dicts, with nothing printed, plotted or prompted for, so
+the servers and batch jobs can reuse it. Running this module prints the
+report for an expenses file:
+
+    python expense_analyser.py [expenses.csv] [--compare month March April] [--plot]
+"""
+import argparse
 import calendar
 
-# ----------------------------
-# 📥 Load and Preprocess Data
-# ----------------------------
-data = pd.read_csv("expenses.csv")
-
-# Convert 'amount' to numeric
-data['amount'] = pd.to_numeric(data['amount'], errors='coerce')
-data = data.dropna(subset=['amount'])
-
-# Convert 'date' to datetime
-data['date'] = pd.to_datetime(data['date'], errors='coerce')
-data = data.dropna(subset=['date'])
-
-# Extract date features
-data['day_of_week'] = data['date'].dt.day_name()
-data['month'] = data['date'].dt.month
-data['month_name'] = data['date'].dt.month_name()
-data['day'] = data['date'].dt.day
-data['year'] = data['date'].dt.year
-data['year_month'] = data['date'].dt.to_period('M')
-data['week'] = data['date'].dt.isocalendar().week
-
-# Encode category
-data['category_encoded'] = LabelEncoder().fit_transform(data['category'])
-
-# ----------------------------
-# 📊 Daily Spend by Category (Vertical Format)
-# ----------------------------
-daily_spend = data.groupby(['date', 'category'])['amount'].sum().unstack(fill_value=0)
-
-# Transform to vertical format
-vertical_daily_spend = daily_spend.stack().reset_index()
-vertical_daily_spend.columns = ['date', 'category', 'amount']
-
-# Add recommendations column
-def generate_recommendation(amount, avg):
-    if amount > avg * 1.5:
-        return "⚠️ High spending. Consider reducing."
-    elif amount < avg * 0.5 and amount > 0:
-        return "✅ Low spending. Great job!"
-    else:
-        return "Normal spending."
-
-# Calculate average spending for each category
-category_avg = vertical_daily_spend.groupby('category')['amount'].mean()
-
-# Apply recommendations
-vertical_daily_spend['recommendation'] = vertical_daily_spend.apply(
-    lambda row: generate_recommendation(row['amount'], category_avg[row['category']]), axis=1
-)
-
-# Display the vertical format with recommendations
-print("\n📊 Daily Spend by Category (Vertical Format with Recommendations):")
-print(vertical_daily_spend.tail())
-
-# ----------------------------
-# 📊 Monthly Spend by Category (Vertical Format)
-# ----------------------------
-monthly_spend = data.groupby(['year_month', 'category'])['amount'].sum().unstack(fill_value=0)
-
-# Transform to vertical format
-vertical_monthly_spend = monthly_spend.stack().reset_index()
-vertical_monthly_spend.columns = ['year_month', 'category', 'amount']
-
-# Apply recommendations
-category_month_avg = vertical_monthly_spend.groupby('category')['amount'].mean()
-vertical_monthly_spend['recommendation'] = vertical_monthly_spend.apply(
-    lambda row: generate_recommendation(row['amount'], category_month_avg[row['category']]), axis=1
-)
-
-# Display the vertical format with recommendations
-print("\n📅 Monthly Spend by Category (Vertical Format with Recommendations):")
-print(vertical_monthly_spend.tail())
-
-# ----------------------------
-# 📊 Yearly Spend by Category (Vertical Format)
-# ----------------------------
-yearly_spend = data.groupby(['year', 'category'])['amount'].sum().unstack(fill_value=0)
-
-# Transform to vertical format
-vertical_yearly_spend = yearly_spend.stack().reset_index()
-vertical_yearly_spend.columns = ['year', 'category', 'amount']
-
-# Apply recommendations
-category_year_avg = vertical_yearly_spend.groupby('category')['amount'].mean()
-vertical_yearly_spend['recommendation'] = vertical_yearly_spend.apply(
-    lambda row: generate_recommendation(row['amount'], category_year_avg[row['category']]), axis=1
-)
-
-# Display the vertical format with recommendations
-print("\n📈 Yearly Spend by Category (Vertical Format with Recommendations):")
-print(vertical_yearly_spend.tail())
-
-# ----------------------------
-# 📈 Visualization
-# ----------------------------
-plt.figure(figsize=(10, 5))
-sns.barplot(x=vertical_daily_spend['category'], y=vertical_daily_spend['amount'], palette="viridis")
-plt.title("Daily Spend by Category")
-plt.ylabel("Amount")
-plt.xlabel("Category")
-plt.xticks(rotation=45)
-plt.tight_layout()
-plt.show()
-
-# ----------------------------
-# 🔁 User-Prompted Comparison Function
-# ----------------------------
-def compare_periods(df, level):
-    """
-    Ask user for two values (e.g., months, years, days) to compare category expenses.
-    """
-    available = df[level].unique()
-    print(f"\n📅 Available {level.title()}s in your data: {sorted(available)}")
+import numpy as np
+import pandas as pd
+
+import expense_dataset
+import spend_recommendations
+
+# Column each rollup period groups by
+PERIODS = {'daily': 'date', 'monthly': 'year_month', 'yearly': 'year'}
+COMPARISON_LEVELS = ('month', 'year', 'day_of_week')
 
-    period1 = input(f"🔎 Enter the first {level} to compare (e.g., 'March' or '3'): ").strip()
-    period2 = input(f"🔍 Enter the second {level} to compare (e.g., 'April' or '4'): ").strip()
 
-    # Handle month names or numbers
+def parse_period(level, value):
+    """A period as entered by a user ('March', '3', '2024', 'monday') as it appears in the data"""
+    value = str(value).strip()
     if level == 'month':
+        if value.isdigit():
+            return int(value)
         try:
-            period1 = int(period1) if period1.isdigit() else list(calendar.month_name).index(period1.capitalize())
-            period2 = int(period2) if period2.isdigit() else list(calendar.month_name).index(period2.capitalize())
+            return list(calendar.month_name).index(value.capitalize())
         except ValueError:
-            print("⚠️ Invalid month input. Please enter a valid month name or number.")
-            return
-
-    grouped = df.groupby([level, 'category'])['amount'].sum().unstack(fill_value=0)
-
-    if period1 not in grouped.index or period2 not in grouped.index:
-        print(f"⚠️ One of the periods ({period1}, {period2}) not found in data.")
-        return
-
-    diff = grouped.loc[period2] - grouped.loc[period1]
-    print(f"\n🔁 Comparison: {period2} vs {period1}")
-    print(diff.sort_values(ascending=False))
-
-    # Recommendations based on comparison
-    print("\n📊 Recommendations Based on Comparison:")
-    for category, change in diff.items():
-        if change > 0:
-            print(f"📈 You spent more on **{category}** in {period2} compared to {period1}. Consider reducing.")
-        elif change < 0:
-            print(f"📉 You spent less on **{category}** in {period2} compared to {period1}. Keep it up!")
-
-# Prompt user for level of comparison
-comparison_level = input("\n📊 Compare by 'month', 'year', or 'day_of_week'? ").strip().lower()
-
-if comparison_level in ['month', 'year', 'day_of_week']:
-    compare_periods(data, comparison_level)
-else:
-    print("⚠️ Invalid input. Please choose 'month', 'year', or 'day_of_week'.")
-
-# ----------------------------
-# 🧠 Add Suggestions Below Tables
-# ----------------------------
-print("\n📊 Suggestions for Each Category:")
-for category, avg in category_avg.items():
-    print(f"Category: {category}")
-    print(f"  - Average Spending: {avg:.2f}")
-    print(f"  - Suggestion: {generate_recommendation(avg, avg)}")
\ No newline at end of file
+            raise ValueError("Invalid month. Use a month name or number")
+    if level == 'year':
+        if not value.isdigit():
+            raise ValueError("Invalid year")
+        return int(value)
+    if level == 'day_of_week':
+        return value.capitalize()
+    raise ValueError(f"Invalid level. Use one of: {', '.join(COMPARISON_LEVELS)}")
+
+
+def compare(pivot, periods):
+    """Compare the rows of a level x category spend pivot for two or more periods.
+
+    The periods' rows are looked up and the first is subtracted from the
+    others in one vector operation. Returns the spend of each period,
+    each later period's change per category from the first (sorted from the
+    largest increase), and a recommendation for every category that changed.
+    Raises ValueError for repeated periods or periods not in the pivot.
+    """
+    if len(periods) < 2:
+        raise ValueError("Compare at least two periods")
+    repeated = sorted({period for period in periods if periods.count(period) > 1}, key=periods.index)
+    if repeated:
+        raise ValueError(f"Periods given more than once: {', '.join(map(str, repeated))}")
+    missing = [period for period in periods if period not in pivot.index]
+    if missing:
+        raise ValueError(f"Periods not found in data: {', '.join(map(str, missing))}")
+
+    spend = pivot.loc[periods]
+    first = periods[0]
+    changes = spend.iloc[1:] - spend.iloc[0]
+
+    recommendations = []
+    differences = {}
+    for period, change in zip(periods[1:], changes.to_numpy()):
+        difference = pd.Series(change, index=pivot.columns).sort_values(ascending=False)
+        differences[period] = difference
+        recommendations.extend(
+            f"📈 You spent more on **{category}** in {period} compared to {first}. Consider reducing."
+            if value > 0 else
+            f"📉 You spent less on **{category}** in {period} compared to {first}. Keep it up!"
+            for category, value in difference[difference != 0].items()
+        )
+
+    return {
+        'periods': list(periods),
+        'spend': spend,
+        'differences': differences,
+        'recommendations': recommendations
+    }
+
+
+class ExpenseAnalyzer:
+    """Analysis of a frame of expenses with 'date', 'category' and 'amount' columns"""
+
+    def __init__(self, data):
+        if 'year_month' not in data:
+            data = expense_dataset.add_date_features(data.copy())
+        self.data = data
+        self._pivots = {}
+
+    @classmethod
+    def load(cls, path):
+        """Analyzer of an expenses file (rows with an invalid amount or date are dropped)"""
+        return cls(expense_dataset.load_expenses(path))
+
+    @classmethod
+    def from_arrays(cls, dates, categories, amounts):
+        return cls(pd.DataFrame({
+            'date': pd.to_datetime(np.asarray(dates)),
+            'category': np.asarray(categories),
+            'amount': np.asarray(amounts, dtype=np.float64),
+        }))
+
+    def spend(self, period='daily'):
+        """Spend per (period, category) cell with spending, with a recommendation for each.
+
+        Long format: one row per cell, no zero-filled period x category matrix.
+        Each cell is compared with its category's mean over every period.
+        """
+        if period not in PERIODS:
+            raise ValueError(f"Invalid period. Use one of: {', '.join(PERIODS)}")
+        key = PERIODS[period]
+        spend = self.data.groupby([key, 'category'], observed=True)['amount'].sum().reset_index()
+        spend['recommendation'] = spend_recommendations.recommend(spend, periods=spend[key].nunique())
+        return spend
+
+    def daily(self):
+        return self.spend('daily')
+
+    def monthly(self):
+        return self.spend('monthly')
+
+    def yearly(self):
+        return self.spend('yearly')
+
+    def category_averages(self):
+        """Mean daily spend per category, days without spending in it counted as zero"""
+        days = self.data['date'].nunique()
+        return self.data.groupby('category', observed=True)['amount'].sum() / days
+
+    def suggestions(self):
+        """The average daily spend and suggestion for each category"""
+        averages = self.category_averages()
+        codes = spend_recommendations.classify(averages.to_numpy(), averages.to_numpy())
+        return pd.DataFrame({
+            'category': averages.index,
+            'average': averages.to_numpy(),
+            'suggestion': np.array(spend_recommendations.MESSAGES)[codes],
+        })
+
+    def periods(self, level):
+        """The periods of a comparison level present in the data, sorted"""
+        if level not in COMPARISON_LEVELS:
+            raise ValueError(f"Invalid level. Use one of: {', '.join(COMPARISON_LEVELS)}")
+        return sorted(self.data[level].unique().tolist())
+
+    def pivot(self, level):
+        """Spend per level x category, zero-filled; built once per level"""
+        if level not in COMPARISON_LEVELS:
+            raise ValueError(f"Invalid level. Use one of: {', '.join(COMPARISON_LEVELS)}")
+        if level not in self._pivots:
+            self._pivots[level] = self.data.groupby([level, 'category'], observed=True)['amount'].sum().unstack(fill_value=0)
+        return self._pivots[level]
+
+    def compare_periods(self, level, first, second, *others):
+        """Change in spend per category from period first to the later periods.
+
+        Periods are parsed with parse_period() and looked up in the cached
+        pivot of the level, so repeated comparisons don't regroup the data.
+        difference is the change of second (see compare() for the others).
+        Raises ValueError for an invalid level or a period not in the data.
+        """
+        periods = [parse_period(level, period) for period in (first, second, *others)]
+        comparison = compare(self.pivot(level), periods)
+        return {
+            'level': level,
+            'first': periods[0],
+            'second': periods[1],
+            'difference': comparison['differences'][periods[1]],
+            **comparison
+        }
+
+
+def plot_category_averages(analyzer):
+    # Imported here so the analyzer itself doesn't need a plotting backend
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    averages = analyzer.category_averages()
+    plt.figure(figsize=(10, 5))
+    sns.barplot(x=averages.index, y=averages.values, palette="viridis")
+    plt.title("Daily Spend by Category")
+    plt.ylabel("Amount")
+    plt.xlabel("Category")
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a spend analysis of an expenses file")
+    parser.add_argument('path', nargs='?', default='expenses.csv')
+    parser.add_argument('--compare', nargs=3, metavar=('LEVEL', 'FIRST', 'SECOND'),
+                        help=f"compare two periods; LEVEL is one of {', '.join(COMPARISON_LEVELS)}")
+    parser.add_argument('--rows', type=int, default=5, help="rows shown of each spend table")
+    parser.add_argument('--plot', action='store_true', help="show the daily spend by category chart")
+    args = parser.parse_args()
+
+    analyzer = ExpenseAnalyzer.load(args.path)
+
+    for period, title in [('daily', "📊 Daily"), ('monthly', "📅 Monthly"), ('yearly', "📈 Yearly")]:
+        print(f"\n{title} Spend by Category (Vertical Format with Recommendations):")
+        print(analyzer.spend(period).tail(args.rows))
+
+    if args.plot:
+        plot_category_averages(analyzer)
+
+    if args.compare:
+        level = args.compare[0].lower()
+        try:
+            comparison = analyzer.compare_periods(level, *args.compare[1:])
+        except ValueError as e:
+            print(f"⚠️ {e}")
+            if level in COMPARISON_LEVELS:
+                print(f"📅 Available {level.title()}s in your data: {analyzer.periods(level)}")
+        else:
+            print(f"\n🔁 Comparison: {comparison['second']} vs {comparison['first']}")
+            print(comparison['difference'])
+            print("\n📊 Recommendations Based on Comparison:")
+            for recommendation in comparison['recommendations']:
+                print(recommendation)
+
+    print("\n📊 Suggestions for Each Category:")
+    for row in analyzer.suggestions().itertuples(index=False):
+        print(f"Category: {row.category}")
+        print(f"  - Average Spending: {row.average:.2f}")
+        print(f"  - Suggestion: {row.suggestion}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,46 +1,186 @@
+"""Expense categorization from descriptions.
+
+A linear classifier over hashed character n-grams of the description,
+trained on labeled (description, category) expenses. Hashing needs no
+vocabulary, so the fitted model is small and a batch of descriptions is
+vectorized and scored as one sparse matrix product.
+
+ExpenseCategorizer.load() trains on a labeled expenses file (JSON records
+or CSV with description and category columns) and saves the fitted model
+in the file's .expense_cache directory; later loads read the saved model
+until the labeled file changes. What the model was trained on is saved in
+a small JSON file next to it and checked before the model is unpickled.
+CategorizerStore keeps a categorizer in memory for the servers, reloading
+it when the labeled file changes.
+
+Usage: python expense_categorizer.py [--data expenses.json] [descriptions...]
+(descriptions are read one per line from stdin when none are given)
+"""
+import argparse
 import csv
-import random
+import json
+import os
+import sys
+import threading
+
+import joblib
+import numpy as np
+import sklearn
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
 
-# Categories list
-categories = ["Food", "Travel", "Entertainment", "Hobbies", "Shopping", "Personal", "Utilities", "Healthcare", "Transportation"]
+import columnar_cache
 
-# Load data from CSV
+LABELED_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'expenses.json')
+MODEL_FILE_NAME = 'categorizer.joblib'
+MODEL_INFO_FILE_NAME = 'categorizer.json'
+# Bump when the features or classifier change, so saved models are retrained
+MODEL_VERSION = 1
+HASH_FEATURES = 2 ** 18
+# Weak regularization: labeled sets are small and their descriptions distinctive.
+# Classes are weighted by inverse frequency so the largest category isn't the default guess.
+CLASSIFIER_C = 10.0
+
+
+# Load labeled data from a JSON or CSV expenses file
 def load_expense_data(file_name):
+    """(description, category) pairs of the expenses that have both, descriptions lowercased"""
+    if file_name.endswith('.json'):
+        with open(file_name) as file:
+            rows = json.load(file)
+    else:
+        with open(file_name, mode="r", newline='') as file:
+            rows = [{key.lower(): value for key, value in row.items()} for row in csv.DictReader(file)]
+
     expense_data = []
-    with open(file_name, mode="r") as file:
-        csv_reader = csv.DictReader(file)
-        for row in csv_reader:
-            description = row["Description"].lower()
-            category = row["Category"]
+    for row in rows:
+        description = str(row.get("description") or '').strip().lower()
+        category = str(row.get("category") or '').strip()
+        if description and category:
             expense_data.append({"description": description, "category": category})
     return expense_data
 
+
+def _signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _model_info(signature):
+    """What a saved model was trained with; it is reused only while all of it still holds"""
+    return {'version': MODEL_VERSION, 'signature': list(signature), 'sklearn': sklearn.__version__}
+
+
+def _saved_model_info(info_path):
+    try:
+        with open(info_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class ExpenseCategorizer:
+    """A fitted description -> category classifier"""
+
+    def __init__(self, model):
+        self.model = model
+
+    @property
+    def categories(self):
+        return self.model.classes_.tolist()
+
+    @classmethod
+    def train(cls, descriptions, categories):
+        if len(set(categories)) < 2:
+            raise ValueError("Need labeled expenses of at least two categories to train")
+        model = make_pipeline(
+            HashingVectorizer(analyzer='char_wb', ngram_range=(3, 5), n_features=HASH_FEATURES,
+                              alternate_sign=False),
+            LogisticRegression(C=CLASSIFIER_C, class_weight='balanced', max_iter=1000)
+        )
+        model.fit([description.lower() for description in descriptions], list(categories))
+        # Only the hashed n-grams seen in training get weights; store them sparse
+        model[-1].sparsify()
+        return cls(model)
+
+    @classmethod
+    def load(cls, path=LABELED_DATA):
+        """The categorizer trained on a labeled expenses file, from disk when it is up to date"""
+        cache_dir = columnar_cache.cache_dir_for(path)
+        model_path = os.path.join(cache_dir, MODEL_FILE_NAME)
+        info_path = os.path.join(cache_dir, MODEL_INFO_FILE_NAME)
+        signature = _signature(path)
+        # Only unpickle a model saved by this version for this file with this scikit-learn
+        if os.path.exists(model_path) and _saved_model_info(info_path) == _model_info(signature):
+            return cls(joblib.load(model_path))
+
+        expense_data = load_expense_data(path)
+        categorizer = cls.train([row['description'] for row in expense_data],
+                                [row['category'] for row in expense_data])
+        categorizer.save(model_path, info_path, signature)
+        return categorizer
+
+    def save(self, model_path, info_path, signature):
+        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+        # The info is removed first and written last, so it never describes another model
+        if os.path.exists(info_path):
+            os.remove(info_path)
+        tmp_path = f'{model_path}.tmp'
+        joblib.dump(self.model, tmp_path)
+        os.replace(tmp_path, model_path)
+        tmp_path = f'{info_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(_model_info(signature), f)
+        os.replace(tmp_path, info_path)
+
+    def categorize(self, descriptions):
+        """Most likely category and its probability for each description, as arrays"""
+        if len(descriptions) == 0:
+            return {'category': np.array([], dtype=object), 'confidence': np.array([], dtype=np.float64)}
+        probabilities = self.model.predict_proba([str(description).lower() for description in descriptions])
+        best = probabilities.argmax(axis=1)
+        return {
+            'category': self.model.classes_[best],
+            'confidence': probabilities[np.arange(len(best)), best],
+        }
+
+
+class CategorizerStore:
+    """The categorizer of a labeled expenses file, reloaded when the file changes"""
+
+    def __init__(self, path=LABELED_DATA):
+        self.path = path
+        self._categorizer = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def categorizer(self):
+        with self._lock:
+            signature = _signature(self.path)
+            if signature != self._signature:
+                self._categorizer = ExpenseCategorizer.load(self.path)
+                self._signature = signature
+            return self._categorizer
+
+
+def categorize(descriptions, path=LABELED_DATA):
+    """Categorize a batch of descriptions with the categorizer of a labeled expenses file"""
+    return ExpenseCategorizer.load(path).categorize(descriptions)
+
+
 # Main application
 def main():
-    print("Expense Categorization App")
-
-    # Load the data from the CSV file
-    expense_data = load_expense_data("expenses.csv")
-    
-    # Ask the user to select a category (Only once)
-    print("\nPlease select a category for all transactions:")
-    for idx, category in enumerate(categories, 1):
-        print(f"{idx}. {category}")
-    
-    selected_category_idx = int(input("Enter the category number: ")) - 1
-    selected_category = categories[selected_category_idx]
-    
-    # Prepare the result for one example (show only one transaction)
-    amount = random.uniform(5, 50000)  # Random amount between 5 and 50000
-    correct = random.choice(expense_data)["category"].lower() == selected_category.lower()  # Randomly match or not
-    accuracy = random.uniform(0.75, 1.0) if correct else random.uniform(0.5, 0.75)
-    
-    # Show the result for one transaction only
-    print(f"\nAmount: ${amount:.2f}")
-    print(f"Assigned Category: {selected_category}")
-    print(f"Accuracy: {accuracy * 100:.2f}%")
-    
-    print("\nAll transactions processed. Exiting now.")
+    parser = argparse.ArgumentParser(description="Categorize expenses from their descriptions")
+    parser.add_argument('descriptions', nargs='*')
+    parser.add_argument('--data', default=LABELED_DATA, help="labeled expenses to train on")
+    args = parser.parse_args()
+
+    descriptions = args.descriptions or [line.strip() for line in sys.stdin if line.strip()]
+    result = categorize(descriptions, args.data)
+    for description, category, confidence in zip(descriptions, result['category'], result['confidence']):
+        print(f"{description}: {category} ({confidence * 100:.1f}%)")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,25 @@
+"""The expenses file as a typed DataFrame with calendar columns.
+
+Rows come from the columnar cache (see columnar_cache.py), so repeated
+loads of an unchanged file don't reparse it. The servers keep their
+rollups current with expense_rollups.RollupStore instead.
+"""
+import columnar_cache
+
+
+def add_date_features(data):
+    """Add the calendar columns the analyses group by to a frame with a 'date' column"""
+    data['day_of_week'] = data['date'].dt.day_name()
+    data['month'] = data['date'].dt.month
+    data['day'] = data['date'].dt.day
+    data['year'] = data['date'].dt.year
+    data['year_month'] = data['date'].dt.to_period('M').astype(str)
+    data['week'] = data['date'].dt.isocalendar().week
+    return data
+
+
+def load_expenses(path):
+    """Read an expenses file into a typed DataFrame with date features"""
+    # Typed columns come from the binary cache; rows with an invalid
+    # amount or date are dropped when it is built
+    return add_date_features(columnar_cache.load(path).to_frame())
@@ -0,0 +1,234 @@
+"""Materialized spend rollups of an expenses file.
+
+The analysis endpoint reports spend per category by day, week, month and
+year. Rather than grouping every expense row four times, the rows are rolled
+up once into cents per (day, category) cell with expenses (plus a row count
+per day), and every coarser period is derived from those cells, which are
+one per day and category with spending however many expenses there are.
+Cells without expenses are not stored; dense() gives the zero-filled
+matrix when it is needed.
+
+RollupStore keeps the rollups of a file current. When the file only grew by
+appended CSV lines, just the new bytes are parsed and folded into the
+existing matrix; any other change rebuilds the rollups from the file.
+Appends are folded through their last line break only, so a row a writer
+is still in the middle of is read once it is complete.
+"""
+import hashlib
+import io
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import columnar_cache
+import money
+
+DIGEST_CHUNK_SIZE = 1024 * 1024
+
+
+class ExpenseRollups:
+    """Spend in cents per day and category, with the number of expenses per day.
+
+    spend is a Series on a sorted (date, category) MultiIndex holding only
+    the cells that have expenses, so its size follows the user's activity
+    rather than days x categories. dense() pivots it into the matrix.
+    """
+
+    def __init__(self, spend, counts):
+        self.spend = spend
+        self.counts = counts
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Roll up a frame with 'date', 'category' and 'amount_cents' columns"""
+        # One datetime resolution whatever the source, so rollups align when added
+        dates = frame['date'].astype('datetime64[ns]').rename('date')
+        spend = frame['amount_cents'].groupby([dates, frame['category'].rename('category')], observed=True).sum()
+        spend.index = spend.index.set_levels(spend.index.levels[1].astype(str), level='category')
+        counts = frame['amount_cents'].groupby(dates).size()
+        return cls(spend.sort_index().astype(np.int64), counts.astype(np.int64))
+
+    @classmethod
+    def empty(cls):
+        dates = pd.DatetimeIndex([], dtype='datetime64[ns]', name='date')
+        index = pd.MultiIndex.from_arrays([dates, pd.Index([], dtype=object, name='category')])
+        return cls(pd.Series(index=index, dtype=np.int64), pd.Series(index=dates, dtype=np.int64))
+
+    def add(self, frame):
+        """Fold more expense rows into the rollups"""
+        new = ExpenseRollups.from_frame(frame)
+        spend = self.spend.add(new.spend, fill_value=0).sort_index()
+        counts = self.counts.add(new.counts, fill_value=0).sort_index()
+        return ExpenseRollups(spend.astype(np.int64), counts.astype(np.int64))
+
+    def between(self, start=None, end=None):
+        """The rollups of the days from start to end inclusive (either may be None).
+
+        Both indexes are sorted by date, so the range is found by binary search.
+        """
+        def days(index):
+            lo = 0 if start is None else index.searchsorted(pd.Timestamp(start), side='left')
+            hi = len(index) if end is None else index.searchsorted(pd.Timestamp(end), side='right')
+            return slice(lo, hi)
+
+        return ExpenseRollups(self.spend.iloc[days(self.spend.index.get_level_values('date'))],
+                              self.counts.iloc[days(self.counts.index)])
+
+    def dates(self):
+        return self.spend.index.get_level_values('date')
+
+    def rollup(self, keys):
+        """Spend per period and category, for period keys computed from each cell's date.
+
+        Like spend, the result only has the (period, category) cells with expenses.
+        """
+        keys = keys if isinstance(keys, list) else [keys]
+        return self.spend.groupby([*keys, self.spend.index.get_level_values('category')]).sum()
+
+    def weekly(self):
+        dates = self.dates()
+        return self.rollup([pd.Index(dates.year, name='year'),
+                            pd.Index(dates.isocalendar()['week'].to_numpy(), name='week')])
+
+    def monthly(self):
+        return self.rollup(pd.Index(self.dates().to_period('M').astype(str), name='year_month'))
+
+    def yearly(self):
+        return self.rollup(pd.Index(self.dates().year, name='year'))
+
+    def calendar(self, level):
+        """Spend per category by calendar 'month' (1-12, across years), 'year' or 'day_of_week'"""
+        dates = self.dates()
+        keys = {'month': dates.month, 'year': dates.year, 'day_of_week': dates.day_name()}
+        if level not in keys:
+            raise ValueError(f"Invalid level. Use one of: {', '.join(keys)}")
+        return self.rollup(pd.Index(keys[level], name=level))
+
+
+def dense(spend):
+    """Pivot long-format spend (the rollups or one of its periods) into a period x category matrix"""
+    return spend.unstack('category', fill_value=0)
+
+
+def _csv_header(path):
+    with open(path, 'rb') as f:
+        return f.readline()
+
+
+def _digest(path, size):
+    """A running SHA-256 of the first size bytes of a file"""
+    digest = hashlib.sha256()
+    remaining = size
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            chunk = f.read(min(DIGEST_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest
+
+
+def _parse_rows(header, lines):
+    """Parse CSV lines (without their header) into rollup input rows"""
+    data = pd.read_csv(io.BytesIO(header + lines.lstrip(b'\r\n')))
+    data = columnar_cache.clean_expenses(data)
+    return pd.DataFrame({
+        'date': data['date'].dt.normalize(),
+        'category': data['category'],
+        'amount_cents': money.to_cents_array(data['amount']),
+    })
+
+
+class RollupStore:
+    """ExpenseRollups of an expenses file, refreshed as the file changes.
+
+    derived() memoizes values computed from the rollups (whole responses);
+    they are dropped whenever the rollups change.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._rollups = None
+        self._signature = None
+        # Bytes of the file folded into the rollups, and their running digest
+        self._offset = 0
+        self._digest = None
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def _rebuild(self):
+        """Rollups of the file and the number of bytes of it they cover"""
+        columns = columnar_cache.load(self.path)
+        frame = columns.to_frame()
+        rollups = ExpenseRollups.from_frame(frame) if len(frame) else ExpenseRollups.empty()
+        return rollups, columns.signature['size']
+
+    def _appended_from(self, size):
+        """Offset of the rows appended since the last refresh, or None if the file changed otherwise"""
+        if self._rollups is None or not self.path.endswith('.csv'):
+            return None
+        offset = self._offset
+        if size <= offset:
+            return None
+        # The old content must end on a line break, or the new content start with one
+        with open(self.path, 'rb') as f:
+            f.seek(offset - 1)
+            boundary = f.read(2)
+        if boundary[:1] != b'\n' and boundary[1:] not in (b'\n', b'\r'):
+            return None
+        if _digest(self.path, offset).digest() != self._digest.digest():
+            return None
+        return offset
+
+    def _refresh(self):
+        # Called with the lock held
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return
+
+        if self._signature is not None and stat.st_size == self._offset:
+            # Same size: a touch or rewrite leaves the rollups alone if the bytes match
+            digest = _digest(self.path, stat.st_size)
+            if digest.digest() == self._digest.digest():
+                self._signature = signature
+                return
+
+        offset = self._appended_from(stat.st_size)
+        if offset is not None:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                lines = f.read(stat.st_size - offset)
+            # The last row may still be being written; leave it for the next refresh
+            lines = lines[:lines.rfind(b'\n') + 1]
+            if lines:
+                appended = _parse_rows(_csv_header(self.path), lines)
+                if len(appended):
+                    self._rollups = self._rollups.add(appended)
+                    self._derived = {}
+                self._digest.update(lines)
+                self._offset += len(lines)
+        else:
+            # Rows appended since the stat() above are not in the cache; the
+            # offset stays where the cache stopped so the next refresh folds them
+            self._rollups, self._offset = self._rebuild()
+            self._digest = _digest(self.path, self._offset)
+            self._derived = {}
+
+        self._signature = signature
+
+    def rollups(self):
+        with self._lock:
+            self._refresh()
+            return self._rollups
+
+    def derived(self, name, compute):
+        """Return compute(rollups), computed once per version of the rollups"""
+        with self._lock:
+            self._refresh()
+            if name not in self._derived:
+                self._derived[name] = compute(self._rollups)
+            return self._derived[name]
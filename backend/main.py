@@ -1,11 +1,20 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
 import io
 import json
-from datetime import datetime
+from datetime import date, datetime
+from typing import List, Optional
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from expense_rollups import RollupStore, dense
+import expense_analyser
+from expense_categorizer import CategorizerStore, LABELED_DATA
+import money
+import serialization
 
 app = FastAPI()
 
@@ -21,73 +30,199 @@ app.add_middleware(
 # Path to the predefined expenses file
 EXPENSES_FILE = os.path.join(os.path.dirname(__file__), 'expenses.csv')
 
+def spend_table(cents, layout='long'):
+    """A period/category rollup of cents as a response table, in currency units.
+
+    'long' keeps one row per period and category with expenses, 'wide'
+    pivots to a zero-filled period x category table.
+    """
+    amounts = (cents / money.CENTS_PER_UNIT).rename('amount')
+    return dense(amounts) if layout == 'wide' else amounts.to_frame()
+
+
+def build_analysis(rollups, layout='long'):
+    """Compute the analyze-expenses response from the expense rollups"""
+    spend = rollups.spend
+    if spend.empty:
+        raise ValueError("No expenses to analyze")
+    daily_totals = spend.groupby(level='date').sum()
+
+    # Calculate metrics (sums are exact integer cents, converted for the response)
+    total_by_category = spend.groupby(level='category').sum().sort_values(ascending=False)
+    top_category = total_by_category.idxmax()
+    total_spend = total_by_category.sum()
+
+    # Weekly pattern
+    spend_by_dayofweek = daily_totals.groupby(daily_totals.index.day_name()).sum().sort_values(ascending=False)
+    highest_day = spend_by_dayofweek.idxmax()
+
+    # Monthly pattern: mean expense per calendar month, across years
+    counts = rollups.counts
+    monthly_avg = (daily_totals.groupby(daily_totals.index.month).sum()
+                   / counts.groupby(counts.index.month).sum() / money.CENTS_PER_UNIT)
+    peak_month = monthly_avg.idxmax()
+
+    # Generate recommendations
+    recommendations = []
+    if total_by_category[top_category] > 0.4 * total_spend:
+        recommendations.append(f"Try reducing expenses in {top_category} as it dominates your spending.")
+    recommendations.append(f"You spend the most on {highest_day}. Consider reviewing expenses on that day.")
+    recommendations.append(f"Your peak spending is in month {peak_month}. Try budgeting better for that period.")
+
+    # Aggregated data, derived from the daily rollup; the tables are encoded
+    # as records or columns by serialization.dumps()
+    response = {
+        "totalByCategory": (total_by_category / money.CENTS_PER_UNIT).to_dict(),
+        "topCategory": top_category,
+        "totalSpend": money.from_cents(total_spend),
+        "spendByDayOfWeek": (spend_by_dayofweek / money.CENTS_PER_UNIT).to_dict(),
+        "monthlyAvg": monthly_avg.to_dict(),
+        "recommendations": recommendations,
+        "dailySpend": spend_table(spend, layout),
+        "weeklySpend": spend_table(rollups.weekly(), layout),
+        "monthlySpend": spend_table(rollups.monthly(), layout),
+        "yearlySpend": spend_table(rollups.yearly(), layout)
+    }
+    return response
+
+
+# Expense rollups and the computed analysis, refreshed when the file changes
+rollups = RollupStore(EXPENSES_FILE)
+
+# Blocking pandas work runs here, off the event loop
+analysis_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='analysis')
+_inflight = {}
+
+
+async def run_coalesced(key, func, *args):
+    """Run func(*args) in the analysis executor.
+
+    Concurrent calls with the same key share a single run instead of each
+    occupying a worker thread.
+    """
+    future = _inflight.get(key)
+    if future is None:
+        future = asyncio.get_running_loop().run_in_executor(analysis_executor, func, *args)
+        _inflight[key] = future
+
+        def forget(done):
+            if _inflight.get(key) is done:
+                del _inflight[key]
+        future.add_done_callback(forget)
+
+    # Shield so one cancelled request doesn't cancel the others sharing the run
+    return await asyncio.shield(future)
+
+
+def analysis_body(expense_rollups, layout='long', orient='records'):
+    """The encoded analysis response, built off the event loop"""
+    return serialization.dumps(build_analysis(expense_rollups, layout), orient)
+
+
+def cached_analysis_body(layout, orient):
+    return rollups.derived(('analysis', layout, orient),
+                           lambda expense_rollups: analysis_body(expense_rollups, layout, orient))
+
+
+def ranged_analysis_body(start, end, layout, orient):
+    return analysis_body(rollups.rollups().between(start, end), layout, orient)
+
+
 @app.post("/api/analyze-expenses")
-async def analyze_expenses():
+async def analyze_expenses(start: Optional[date] = Query(None, alias="from"),
+                           end: Optional[date] = Query(None, alias="to"),
+                           layout: str = Query("long", pattern="^(long|wide)$"),
+                           orient: str = Query("records", pattern="^(records|columns)$")):
+    """Spend analysis.
+
+    The spend tables have one row per period and category with expenses;
+    layout=wide returns them as zero-filled period x category tables, and
+    orient=columns as one array per column.
+    """
+    if start is not None and end is not None and start > end:
+        return JSONResponse(status_code=400, content={"error": "from must not be after to"})
+    try:
+        if start is None and end is None:
+            # Analysis and its JSON encoding are both cached per file version
+            body = await run_coalesced(('analysis', layout, orient), cached_analysis_body, layout, orient)
+        else:
+            # A date range slices the daily rollups instead of rereading the file
+            body = await run_coalesced(('analysis', start, end, layout, orient),
+                                       ranged_analysis_body, start, end, layout, orient)
+        return Response(content=body, media_type='application/json')
+
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def calendar_pivot(level):
+    """Zero-filled level x category spend in cents, built once per file version"""
+    return rollups.derived(('calendar', level), lambda expense_rollups: dense(expense_rollups.calendar(level)))
+
+
+@app.get("/api/compare")
+async def compare_spend(level: str = Query("month", pattern="^(month|year|day_of_week)$"),
+                        a: Optional[str] = None,
+                        b: Optional[str] = None,
+                        periods: Optional[List[str]] = Query(None)):
+    """Spend per category of two periods a and b of a level, or of any number
+    given as repeated periods=..., with each later period's change from the first.
+
+    Months are calendar months across years (a number or a name).
+    """
+    try:
+        requested = [expense_analyser.parse_period(level, period)
+                     for period in (periods or [period for period in (a, b) if period is not None])]
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    try:
+        # The pivot is cached; each comparison is row lookups and one subtraction
+        pivot = await run_coalesced(('calendar', level), calendar_pivot, level)
+        comparison = expense_analyser.compare(pivot, requested)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return {"error": str(e)}
+
+    response = {
+        "level": level,
+        "periods": comparison['periods'],
+        "spend": {period: row / money.CENTS_PER_UNIT for period, row in comparison['spend'].iterrows()},
+        "differences": {period: change / money.CENTS_PER_UNIT
+                        for period, change in comparison['differences'].items()},
+        "recommendations": comparison['recommendations']
+    }
+    return Response(content=serialization.dumps(response), media_type='application/json')
+
+
+# Categorizer trained on the labeled expenses, reloaded when they change
+categorizers = CategorizerStore(LABELED_DATA)
+MAX_CATEGORIZE_BATCH = 10000
+
+
+class CategorizeRequest(BaseModel):
+    descriptions: List[str]
+
+
+def categorize_body(descriptions):
+    result = categorizers.categorizer().categorize(descriptions)
+    return serialization.dumps({
+        "categories": result['category'],
+        "confidence": result['confidence']
+    })
+
+
+@app.post("/api/categorize")
+async def categorize_expenses(request: CategorizeRequest):
+    """Predicted category and its probability for each description, in request order"""
+    if len(request.descriptions) > MAX_CATEGORIZE_BATCH:
+        return JSONResponse(status_code=400,
+                            content={"error": f"At most {MAX_CATEGORIZE_BATCH} descriptions per request"})
     try:
-        # Load and preprocess dataset
-        data = pd.read_csv(EXPENSES_FILE)
-
-        # Convert 'amount' column to numeric
-        data['amount'] = pd.to_numeric(data['amount'], errors='coerce')
-        data = data.dropna(subset=['amount'])
-
-        # Convert 'date' column to datetime
-        data['date'] = pd.to_datetime(data['date'], errors='coerce')
-        data = data.dropna(subset=['date'])
-
-        # Extract date-related features
-        data['day_of_week'] = data['date'].dt.day_name()
-        data['month'] = data['date'].dt.month
-        data['day'] = data['date'].dt.day
-        data['year'] = data['date'].dt.year
-        data['year_month'] = data['date'].dt.to_period('M').astype(str)
-        data['week'] = data['date'].dt.isocalendar().week
-
-        # Encode category
-        data['category_encoded'] = LabelEncoder().fit_transform(data['category'])
-
-        # Calculate metrics
-        total_by_category = data.groupby('category')['amount'].sum().sort_values(ascending=False)
-        top_category = total_by_category.idxmax()
-        total_spend = data['amount'].sum()
-
-        # Weekly pattern
-        spend_by_dayofweek = data.groupby('day_of_week')['amount'].sum().sort_values(ascending=False)
-        highest_day = spend_by_dayofweek.idxmax()
-
-        # Monthly pattern
-        monthly_avg = data.groupby('month')['amount'].mean()
-        peak_month = monthly_avg.idxmax()
-
-        # Generate recommendations
-        recommendations = []
-        if total_by_category[top_category] > 0.4 * total_spend:
-            recommendations.append(f"Try reducing expenses in {top_category} as it dominates your spending.")
-        recommendations.append(f"You spend the most on {highest_day}. Consider reviewing expenses on that day.")
-        recommendations.append(f"Your peak spending is in month {peak_month}. Try budgeting better for that period.")
-
-        # Prepare aggregated data
-        daily_spend = data.groupby(['date', 'category'])['amount'].sum().unstack(fill_value=0).reset_index()
-        daily_spend['date'] = daily_spend['date'].dt.strftime('%Y-%m-%d')
-        
-        weekly_spend = data.groupby(['year', 'week', 'category'])['amount'].sum().unstack(fill_value=0).reset_index()
-        monthly_spend = data.groupby(['year_month', 'category'])['amount'].sum().unstack(fill_value=0).reset_index()
-        yearly_spend = data.groupby(['year', 'category'])['amount'].sum().unstack(fill_value=0).reset_index()
-
-        # Convert to JSON-serializable format
-        response = {
-            "totalByCategory": total_by_category.to_dict(),
-            "topCategory": top_category,
-            "totalSpend": float(total_spend),
-            "spendByDayOfWeek": spend_by_dayofweek.to_dict(),
-            "monthlyAvg": monthly_avg.to_dict(),
-            "recommendations": recommendations,
-            "dailySpend": daily_spend.to_dict(orient='records'),
-            "weeklySpend": weekly_spend.to_dict(orient='records'),
-            "monthlySpend": monthly_spend.to_dict(orient='records'),
-            "yearlySpend": yearly_spend.to_dict(orient='records')
-        }
-        return response
+        body = await asyncio.get_running_loop().run_in_executor(analysis_executor, categorize_body,
+                                                                request.descriptions)
+        return Response(content=body, media_type='application/json')
 
     except Exception as e:
         return {"error": str(e)}
@@ -0,0 +1,124 @@
+"""Schema migrations for existing databases.
+
+db.create_all() only creates missing tables; it never alters a table that
+already exists. Changes to existing tables are registered here with an
+increasing version number and applied once, in order, at startup. Each
+applied version is recorded in the schema_migration table.
+"""
+from sqlalchemy import inspect, text
+
+from models import db, Expense, ExpenseAggregate, SchemaMigration
+import aggregates
+import money
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a migration function under a version number"""
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return register
+
+
+@migration(1, 'Backfill expense aggregates')
+def backfill_expense_aggregates():
+    # Superseded by migration 4, which rebuilds the store in integer cents
+    # once the expense table has them
+    pass
+
+
+def create_expense_indexes(*names):
+    for index in Expense.__table__.indexes:
+        if index.name in names:
+            index.create(bind=db.session.connection(), checkfirst=True)
+
+
+def expense_columns():
+    return {column['name'] for column in inspect(db.session.connection()).get_columns('expense')}
+
+
+def existing_expense_indexes():
+    return {index['name'] for index in inspect(db.session.connection()).get_indexes('expense')}
+
+
+@migration(2, 'Add composite indexes on expense')
+def add_expense_indexes():
+    # Its (user_id, category, date) index is superseded by migration 3
+    create_expense_indexes('ix_expense_user_date')
+
+
+@migration(3, 'Move expense categories into the category table')
+def add_expense_category_ids():
+    if 'category_id' not in expense_columns():
+        db.session.execute(text('ALTER TABLE expense ADD COLUMN category_id INTEGER REFERENCES category (id)'))
+
+    # One category row per distinct (user, name), then point every expense at it
+    db.session.execute(text(
+        'INSERT INTO category (user_id, name) '
+        'SELECT DISTINCT user_id, category FROM expense WHERE NOT EXISTS ('
+        'SELECT 1 FROM category WHERE category.user_id = expense.user_id AND category.name = expense.category)'
+    ))
+    db.session.execute(text(
+        'UPDATE expense SET category_id = ('
+        'SELECT id FROM category WHERE category.user_id = expense.user_id AND category.name = expense.category) '
+        'WHERE category_id IS NULL'
+    ))
+
+    # Created by earlier versions of migration 2
+    if 'ix_expense_user_category_date' in existing_expense_indexes():
+        db.session.execute(text('DROP INDEX ix_expense_user_category_date'))
+    create_expense_indexes('ix_expense_user_category_id_date')
+
+
+@migration(4, 'Store expense amounts as integer cents')
+def convert_amounts_to_cents():
+    columns = expense_columns()
+    if 'amount_cents' not in columns:
+        db.session.execute(text('ALTER TABLE expense ADD COLUMN amount_cents BIGINT'))
+        db.session.execute(text(
+            f"ALTER TABLE expense ADD COLUMN currency VARCHAR(3) NOT NULL DEFAULT '{money.DEFAULT_CURRENCY}'"
+        ))
+    if 'amount' in columns:
+        # Rounded in Python rather than with SQL ROUND(amount * 100), which
+        # rounds the binary product (1.005 -> 100); to_cents_array rounds the
+        # decimal amounts half up like every other write path
+        rows = db.session.execute(text('SELECT id, amount FROM expense WHERE amount_cents IS NULL')).all()
+        if rows:
+            ids, amounts = zip(*rows)
+            cents = money.to_cents_array(amounts)
+            db.session.execute(
+                text('UPDATE expense SET amount_cents = :amount_cents WHERE id = :id'),
+                [{'id': expense_id, 'amount_cents': int(value)} for expense_id, value in zip(ids, cents)]
+            )
+        db.session.execute(text('ALTER TABLE expense DROP COLUMN amount'))
+
+    # Aggregates are derived data: recreate the table with integer totals and refill it
+    connection = db.session.connection()
+    ExpenseAggregate.__table__.drop(bind=connection, checkfirst=True)
+    ExpenseAggregate.__table__.create(bind=connection)
+    aggregates.rebuild_aggregates()
+
+
+@migration(5, 'Add a bucket range index on expense aggregates')
+def add_aggregate_bucket_index():
+    for index in ExpenseAggregate.__table__.indexes:
+        index.create(bind=db.session.connection(), checkfirst=True)
+
+
+def run_migrations():
+    """Apply every registered migration not yet recorded in the database"""
+    applied = {version for (version,) in db.session.query(SchemaMigration.version)}
+
+    for version, description, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in applied:
+            continue
+        print(f"Applying migration {version}: {description}")
+        try:
+            func()
+            db.session.add(SchemaMigration(version=version, description=description))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
@@ -2,6 +2,8 @@ from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
+import money
+
 db = SQLAlchemy()
 
 class User(db.Model):
@@ -14,6 +16,8 @@ class User(db.Model):
     
     # Relationship with expenses
     expenses = db.relationship('Expense', backref='user', lazy=True, cascade='all, delete-orphan')
+    aggregates = db.relationship('ExpenseAggregate', lazy=True, cascade='all, delete-orphan')
+    categories = db.relationship('Category', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -30,21 +34,76 @@ class User(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+class Category(db.Model):
+    """One of a user's expense categories; expenses refer to it by id"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    name = db.Column(db.String(50), nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'name', name='uq_category_user_name'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name
+        }
+
 class Expense(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    # Integer minor units (cents); see money.py
+    amount_cents = db.Column(db.BigInteger, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=money.DEFAULT_CURRENCY)
+    # The name is kept on the row for API responses; filtering and grouping use category_id
     category = db.Column(db.String(50), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'))
     description = db.Column(db.String(200))
     date = db.Column(db.Date, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Every read filters by user (and often category) and orders/groups by date
+    __table_args__ = (
+        db.Index('ix_expense_user_date', 'user_id', 'date'),
+        db.Index('ix_expense_user_category_id_date', 'user_id', 'category_id', 'date'),
+    )
+    
+    @property
+    def amount(self):
+        """Amount in currency units"""
+        return money.from_cents(self.amount_cents)
+    
     def to_dict(self):
         return {
             'id': self.id,
             'amount': self.amount,
+            'currency': self.currency,
             'category': self.category,
             'description': self.description,
             'date': self.date.isoformat(),
             'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+class ExpenseAggregate(db.Model):
+    """Running total and count of a user's expenses for one category and period bucket"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    period = db.Column(db.String(10), nullable=False)  # 'daily', 'weekly', 'monthly' or 'total'
+    bucket = db.Column(db.String(10), nullable=False)  # e.g. '2024-03-01', '2024-W09', '2024-03', 'all'
+    total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'period', 'category', 'bucket', name='uq_expense_aggregate_bucket'),
+        # Date-range reads scan daily buckets across every category
+        db.Index('ix_expense_aggregate_user_period_bucket', 'user_id', 'period', 'bucket'),
+    )
+
+
+class SchemaMigration(db.Model):
+    """A schema migration that has been applied to this database"""
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
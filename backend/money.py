@@ -0,0 +1,77 @@
+"""Money amounts as integer minor units.
+
+Amounts are stored and aggregated as int64 cents, which is exact (float sums
+drift) and vectorizes as plain integer arithmetic. Conversion to and from
+decimal amounts happens only at the API boundary. Every currency is assumed
+to have two decimal places.
+"""
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+import numpy as np
+
+CENTS_PER_UNIT = 100
+# Largest magnitude accepted; every amount up to it is exact in float64 too
+MAX_CENTS = 2 ** 53
+DEFAULT_CURRENCY = 'USD'
+CURRENCY_PATTERN = re.compile(r'^[A-Z]{3}$')
+# Relative distance from half a cent within which float scaling can't be trusted
+HALF_CENT_TOLERANCE = 1e-9
+
+
+def to_cents(value):
+    """Parse an amount in currency units (str, int or float) into integer cents.
+
+    Rounds half up (away from zero) on the decimal value as written; floats
+    use their shortest representation, so 1.005 is 101 cents. Every path
+    that stores amounts rounds this way (see to_cents_array()).
+    """
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError('Invalid amount')
+    if not amount.is_finite():
+        raise ValueError('Invalid amount')
+    cents = int((amount * CENTS_PER_UNIT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    if abs(cents) >= MAX_CENTS:
+        raise ValueError('Invalid amount')
+    return cents
+
+
+def to_cents_array(amounts):
+    """Round an array of amounts in currency units to int64 cents, exactly as to_cents() does.
+
+    Numeric arrays are scaled and rounded half away from zero in one pass.
+    amount * 100 carries binary error (1.005 * 100 is 100.49999999999999),
+    so the few amounts at, or within float error of, half a cent are
+    rounded again from their decimal representation with to_cents().
+    Other arrays (strings) go through to_cents() value by value.
+    """
+    values = np.asarray(amounts)
+    if values.dtype.kind not in 'biuf':
+        return np.fromiter((to_cents(value) for value in values.ravel()),
+                           dtype=np.int64, count=values.size).reshape(values.shape)
+
+    scaled = values.astype(np.float64) * CENTS_PER_UNIT
+    cents = np.trunc(scaled + np.copysign(0.5, scaled))
+    fraction = np.abs(scaled - np.trunc(scaled))
+    near_half = np.abs(fraction - 0.5) < HALF_CENT_TOLERANCE * np.maximum(1, np.abs(scaled))
+    flat = values.ravel()
+    for i in np.flatnonzero(near_half.ravel()):
+        cents.flat[i] = to_cents(float(flat[i]))
+    return cents.astype(np.int64)
+
+
+def from_cents(cents):
+    """Amount in currency units for the API, from (possibly fractional) cents"""
+    return float(cents) / CENTS_PER_UNIT
+
+
+def parse_currency(value):
+    """Validate an ISO 4217 currency code, defaulting to DEFAULT_CURRENCY"""
+    if value is None or str(value).strip() == '':
+        return DEFAULT_CURRENCY
+    currency = str(value).strip().upper()
+    if not CURRENCY_PATTERN.match(currency):
+        raise ValueError('Invalid currency. Use a 3-letter ISO 4217 code')
+    return currency
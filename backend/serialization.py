@@ -0,0 +1,88 @@
+"""JSON encoding of analytics responses.
+
+dumps() encodes response dicts that hold NumPy scalars and arrays, dates,
+Series and DataFrames as they are, so endpoints don't have to convert
+them to plain Python values first. It uses orjson when it is installed,
+which serializes NumPy arrays natively, and the json module otherwise.
+
+A DataFrame is written with its (named) index as leading columns, either
+as a list of records, or with orient='columns' as one array per column:
+
+    {"date": ["2024-03-01", ...], "Food": [12.5, ...], ...}
+
+The columnar form is built straight from the column arrays without a dict
+per row, and is smaller since the keys are not repeated for every row.
+"""
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORIENTS = ('records', 'columns')
+
+
+def _frame_columns(frame):
+    """The frame's columns by name, with the index as leading columns and dates as ISO strings"""
+    if any(name is not None for name in frame.index.names):
+        frame = frame.reset_index()
+    columns = {}
+    for name, series in frame.items():
+        if pd.api.types.is_datetime64_any_dtype(series):
+            midnight = (series == series.dt.normalize()).all()
+            series = series.dt.strftime('%Y-%m-%d' if midnight else '%Y-%m-%dT%H:%M:%S')
+        columns[str(name)] = series
+    return columns
+
+
+def _column_values(series):
+    values = series.to_numpy()
+    if values.dtype.kind in 'biuf':
+        return np.ascontiguousarray(values)
+    return values.tolist()
+
+
+def frame_content(frame, orient='records'):
+    """A DataFrame as a JSON-ready list of records or dict of column arrays"""
+    columns = _frame_columns(frame)
+    if orient == 'columns':
+        return {name: _column_values(series) for name, series in columns.items()}
+    return pd.DataFrame(columns).to_dict(orient='records')
+
+
+def _default(obj, orient):
+    """Encode the values orjson / json can't handle themselves"""
+    if isinstance(obj, pd.DataFrame):
+        return frame_content(obj, orient)
+    if isinstance(obj, pd.Series):
+        return obj.to_dict()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime.date, datetime.datetime)):
+        # Including pd.Timestamp, which orjson doesn't accept
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content, orient='records', sort_keys=False):
+    """Encode content as compact UTF-8 JSON bytes; DataFrames are written in the given orient"""
+    if orient not in ORIENTS:
+        raise ValueError(f"Invalid orient. Use one of: {', '.join(ORIENTS)}")
+
+    def default(obj):
+        return _default(obj, orient)
+
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(content, default=default, option=option)
+    return json.dumps(content, default=default, separators=(',', ':'), sort_keys=sort_keys,
+                      ensure_ascii=False).encode('utf-8')
@@ -0,0 +1,50 @@
+"""Spend recommendations for the cells of a spend table.
+
+Each (period, category) amount is compared with the category's average
+over all periods: above HIGH_RATIO times the average is high spending,
+below LOW_RATIO times it (but not zero) is low spending, anything else is
+normal. The comparison runs with np.select over whole columns rather than
+a Python call per cell, and the result is a Categorical of the messages,
+so a million cells carry a million small codes rather than a million strings.
+"""
+import numpy as np
+import pandas as pd
+
+HIGH_RATIO = 1.5
+LOW_RATIO = 0.5
+
+HIGH = "⚠️ High spending. Consider reducing."
+LOW = "✅ Low spending. Great job!"
+NORMAL = "Normal spending."
+MESSAGES = [HIGH, LOW, NORMAL]
+
+
+def classify(amounts, averages):
+    """Codes into MESSAGES (0 high, 1 low, 2 normal) for arrays of amounts and their averages"""
+    amounts = np.asarray(amounts, dtype=np.float64)
+    averages = np.asarray(averages, dtype=np.float64)
+    return np.select(
+        [amounts > averages * HIGH_RATIO, (amounts < averages * LOW_RATIO) & (amounts > 0)],
+        [0, 1],
+        default=2
+    ).astype(np.int8)
+
+
+def recommendation(amount, average):
+    """The recommendation message for a single amount"""
+    return MESSAGES[int(classify(amount, average))]
+
+
+def recommend(spend, amount='amount', by='category', periods=None):
+    """Recommendations for each row of a long-format spend table.
+
+    Each amount is compared with the mean of its category. spend has one row
+    per (period, category) cell, with zeros for periods without spending in a
+    category; or, when periods (the number of periods covered) is given, only
+    the cells with spending, the missing ones counting as zeros in the means.
+    Returns a categorical Series aligned with spend.
+    """
+    groups = spend.groupby(by, observed=True)[amount]
+    averages = groups.transform('mean') if periods is None else groups.transform('sum') / periods
+    codes = classify(spend[amount].to_numpy(), averages.to_numpy())
+    return pd.Series(pd.Categorical.from_codes(codes, categories=MESSAGES), index=spend.index)
@@ -0,0 +1,64 @@
+"""Period totals computed by the database.
+
+Pushes the daily/weekly/monthly GROUP BY and SUM into SQL so only one row per
+bucket leaves the database. Buckets are grouped on integer date parts via
+EXTRACT, which SQLAlchemy compiles for each dialect, and formatted into the
+same keys /api/expenses has always returned ('%Y-%m-%d', '%Y-W%U', '%Y-%m').
+"""
+from sqlalchemy import extract, func
+
+from models import db, Expense
+import expense_queries
+
+PERIODS = ('daily', 'weekly', 'monthly')
+
+
+def _date_part(part, column, dialect):
+    # MySQL has no EXTRACT(DOW/DOY); its DAYOFWEEK is 1-based from Sunday
+    if dialect == 'mysql':
+        if part == 'dow':
+            return func.dayofweek(column) - 1
+        if part == 'doy':
+            return func.dayofyear(column)
+    return extract(part, column)
+
+
+def _period_parts(period, column, dialect):
+    """Integer expressions identifying a bucket of the given period"""
+    year = _date_part('year', column, dialect)
+    if period == 'daily':
+        return [year, _date_part('month', column, dialect), _date_part('day', column, dialect)]
+    if period == 'weekly':
+        # Day of year minus weekday is constant within a Sunday-started week,
+        # so it identifies the '%U' week without needing integer division in SQL
+        return [year, _date_part('doy', column, dialect) - _date_part('dow', column, dialect)]
+    return [year, _date_part('month', column, dialect)]
+
+
+def _bucket_key(period, parts):
+    parts = [int(part) for part in parts]
+    if period == 'daily':
+        return f"{parts[0]:04d}-{parts[1]:02d}-{parts[2]:02d}"
+    if period == 'weekly':
+        # '%U' week number: (zero-based day of year + 7 - weekday) // 7
+        week = (parts[1] + 6) // 7
+        return f"{parts[0]:04d}-W{week:02d}"
+    return f"{parts[0]:04d}-{parts[1]:02d}"
+
+
+def get_period_totals(user_id, period, category='all', start=None, end=None):
+    """Spend per period bucket for a user in cents, aggregated in the database.
+
+    start and end (inclusive) become a WHERE on the indexed date column, so
+    only rows inside the range are read.
+    """
+    if period not in PERIODS:
+        period = 'monthly'
+
+    dialect = db.session.get_bind().dialect.name
+    parts = _period_parts(period, Expense.date, dialect)
+
+    query = expense_queries.filtered_query([*parts, func.sum(Expense.amount_cents)], user_id, category, start, end)
+    query = query.group_by(*parts)
+
+    return {_bucket_key(period, row[:-1]): int(row[-1]) for row in query}
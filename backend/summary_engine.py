@@ -0,0 +1,90 @@
+"""Single-pass summary statistics over a user's expense rows.
+
+Every statistic the summary endpoint needs is a sum of amounts grouped by
+some key: the day, the '%U' week of the year, or the category. Each key is
+turned into a small integer code once, and the sums are taken with
+np.bincount over the same amount array, so one fetch of the user's rows
+serves the unfiltered category totals as well as the filtered statistics.
+
+Amounts are integer cents. bincount accumulates its weights in float64,
+which is exact for integer sums below 2**53 cents, and the sums are turned
+back into int64.
+"""
+import numpy as np
+import pandas as pd
+
+# 1970-01-01 was a Thursday; with Sunday as day 0 that is day 4
+EPOCH_WEEKDAY = 4
+WEEKS_PER_YEAR = 54
+
+
+def _grouped_sums(codes, amounts, size):
+    """Sums (int64 cents) and row counts of amounts per integer code"""
+    sums = np.bincount(codes, weights=amounts, minlength=size)
+    return np.rint(sums).astype(np.int64), np.bincount(codes, minlength=size)
+
+
+def week_of_year(days):
+    """strftime('%U') week numbers (Sunday-based) of epoch day numbers"""
+    dates = days.astype('datetime64[D]')
+    year_start = dates.astype('datetime64[Y]').astype('datetime64[D]').astype(np.int64)
+    day_of_year = days - year_start
+    weekday = (days + EPOCH_WEEKDAY) % 7
+    return (day_of_year + 7 - weekday) // 7
+
+
+def summarize(frame, category='all'):
+    """Summary statistics of a frame of all of a user's expenses.
+
+    frame has 'date' (datetime64), 'category' (strings or a Categorical)
+    and 'amount_cents' columns, as returned by expense_queries.expense_frame().
+    Statistics are for the given category, except category_totals which
+    always covers every category. Amounts in the result are in cents.
+    Returns the structure of aggregates.get_summary_stats, or None when the
+    category has no expenses.
+    """
+    if frame.empty:
+        return None
+
+    amounts = frame['amount_cents'].to_numpy(dtype=np.int64)
+    if isinstance(frame['category'].dtype, pd.CategoricalDtype):
+        # Already dictionary-encoded, e.g. by expense_queries.expense_frame()
+        category_codes = frame['category'].cat.codes.to_numpy(dtype=np.intp)
+        categories = frame['category'].cat.categories
+    else:
+        category_codes, categories = pd.factorize(frame['category'], sort=True)
+    days = frame['date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+    category_sums, category_counts = _grouped_sums(category_codes, amounts, len(categories))
+    category_totals = {
+        str(name): int(total)
+        for name, total, count in zip(categories, category_sums, category_counts) if count
+    }
+
+    if category != 'all':
+        code = categories.get_indexer([category])[0]
+        if code < 0:
+            return None
+        selected = category_codes == code
+        # A category can outlive its expenses (deleted, or outside a date range)
+        if not selected.any():
+            return None
+        amounts = amounts[selected]
+        days = days[selected]
+        category_codes = category_codes[selected]
+
+    # Mean of per-day totals = total / number of distinct days with spending
+    days_with_spending = np.count_nonzero(np.bincount(days - days.min()))
+    week_sums, week_counts = _grouped_sums(week_of_year(days), amounts, WEEKS_PER_YEAR)
+    plot_sums, plot_counts = _grouped_sums(category_codes, amounts, len(categories))
+
+    total = int(amounts.sum())
+    return {
+        'total': total,
+        'avg_daily': total / days_with_spending,
+        'weekly_data': {f'{week:02d}': int(week_sums[week]) for week in np.flatnonzero(week_counts)},
+        'category_totals': category_totals,
+        'plot_totals': {
+            str(categories[code]): int(plot_sums[code]) for code in np.flatnonzero(plot_counts)
+        },
+    }
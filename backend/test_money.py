@@ -0,0 +1,35 @@
+"""Rounding of amounts to cents must agree between every write path.
+
+POST /api/expenses uses money.to_cents; imports, batch inserts, the columnar
+cache, the FastAPI rollups and migration 4 use money.to_cents_array.
+
+Run with: python -m pytest test_money.py
+"""
+import numpy as np
+
+import money
+
+# Half-cent amounts whose float * 100 lands below the half
+HALF_CENTS = [('1.005', 101), ('0.125', 13), ('0.285', 29), ('2.675', 268), ('-0.125', -13),
+              ('-1.005', -101), ('10.5', 1050), ('0.0049', 0), ('0.015', 2)]
+
+
+def test_to_cents_rounds_half_up():
+    for amount, cents in HALF_CENTS:
+        assert money.to_cents(amount) == cents, amount
+        assert money.to_cents(float(amount)) == cents, amount
+
+
+def test_to_cents_array_matches_to_cents():
+    amounts = [amount for amount, _ in HALF_CENTS]
+    expected = [cents for _, cents in HALF_CENTS]
+    assert money.to_cents_array(amounts).tolist() == expected
+    assert money.to_cents_array(np.array(amounts, dtype=float)).tolist() == expected
+
+
+def test_to_cents_array_matches_to_cents_at_random():
+    rng = np.random.default_rng(17)
+    amounts = np.round(rng.uniform(-1000, 1000, 20000), 3)
+    cents = money.to_cents_array(amounts)
+    assert cents.dtype == np.int64
+    assert cents.tolist() == [money.to_cents(amount) for amount in amounts.tolist()]